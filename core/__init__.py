@@ -1,7 +1,9 @@
 """
-Core package providing shared utilities such as configuration loading and logging.
+Core package providing shared utilities such as configuration loading, logging
+and on-disk sidecar caches.
 
 Creating this package allows other modules to import common helpers via
     from core.config import load_config
     from core.logger import setup_logger
+    from core.cache import read_sidecar, write_sidecar
 """ 
\ No newline at end of file
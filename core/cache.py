@@ -0,0 +1,48 @@
+"""Pickle sidecar caches for data derived from a file on disk.
+
+The sidecar lives next to its source as ``<name>.pkl`` and records the
+source's ``(st_mtime_ns, st_size, st_ino)``; it is only trusted while that
+stamp still matches, so edits, renames-over and copies all invalidate it.
+"""
+import os
+import pickle
+from pathlib import Path
+
+__all__ = ["file_stamp", "sidecar_path", "read_sidecar", "write_sidecar"]
+
+
+def file_stamp(st: os.stat_result) -> tuple:
+    """Identity of a file version: (st_mtime_ns, st_size, st_ino)."""
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+def sidecar_path(path: Path) -> Path:
+    """Return the sidecar location for *path* (``<name>.pkl`` in the same dir)."""
+    return path.with_name(path.name + ".pkl")
+
+
+def read_sidecar(path: Path, stamp: tuple):
+    """Return the data cached for *path* at version *stamp*, or ``None``."""
+    try:
+        with sidecar_path(path).open("rb") as f:
+            payload = pickle.load(f)
+    except Exception:  # 缺失、损坏或旧格式的 sidecar 一律视为未命中
+        return None
+    if not (isinstance(payload, tuple) and len(payload) == 2 and payload[0] == stamp):
+        return None
+    return payload[1]
+
+
+def write_sidecar(path: Path, stamp: tuple, data) -> None:
+    """Atomically cache *data* for *path* at version *stamp*; failures are ignored."""
+    sidecar = sidecar_path(path)
+    tmp = sidecar.with_name(f"{sidecar.name}.{os.getpid()}.tmp")
+    try:
+        with tmp.open("wb") as f:
+            pickle.dump((stamp, data), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, sidecar)
+    except OSError:
+        try:
+            tmp.unlink()
+        except OSError:
+            pass
@@ -1,14 +1,53 @@
+import copy
+from collections import OrderedDict
 from types import SimpleNamespace
 from pathlib import Path
 import yaml
 
+from .cache import file_stamp, read_sidecar, write_sidecar
+
+try:
+    from yaml import CSafeLoader as _Loader
+except ImportError:  # libyaml 未编译时退回纯 Python 实现
+    from yaml import SafeLoader as _Loader
+
 __all__ = ["load_config"]
 
+# 进程内配置缓存: 绝对路径 -> ((st_mtime_ns, st_size, st_ino), raw_cfg)
+_CACHE_SIZE = 32
+_CACHE: "OrderedDict[str, tuple]" = OrderedDict()
+
 def _dict_to_namespace(d: dict):
-    """Recursively convert a mapping to SimpleNamespace objects."""
+    """Convert a nested mapping to SimpleNamespace objects.
+
+    使用显式栈做后序遍历，避免深层配置递归过深；同一个 dict 对象
+    (如 YAML 锚点引用) 只转换一次。
+    """
     if not isinstance(d, dict):
         return d
-    return SimpleNamespace(**{k: _dict_to_namespace(v) for k, v in d.items()})
+
+    built = {}  # id(dict) -> SimpleNamespace
+    pending = set()
+    stack = [(d, False)]
+    while stack:
+        node, expanded = stack.pop()
+        if id(node) in built:
+            continue
+        if not expanded:
+            if id(node) in pending:
+                raise ValueError("Recursive mapping in config is not supported")
+            pending.add(id(node))
+            stack.append((node, True))
+            stack.extend(
+                (v, False) for v in node.values()
+                if isinstance(v, dict) and id(v) not in built
+            )
+            continue
+        built[id(node)] = SimpleNamespace(**{
+            k: built[id(v)] if isinstance(v, dict) else v
+            for k, v in node.items()
+        })
+    return built[id(d)]
 
 
 def load_config(cfg_path: str):
@@ -19,17 +58,52 @@ def load_config(cfg_path: str):
         cfg = load_config("configs/config.yaml")
         print(cfg.TEXT_SETTINGS.LANGUAGE)
 
+    配置必须是纯数据 YAML（由 SafeLoader 解析，不支持 ``!!python/*`` 标签），
+    顶层须为映射，空文件视为空配置。
+
+    解析结果按文件的 (mtime, size, inode) 缓存，文件未变化时不会重复解析；
+    每次调用都返回由缓存深拷贝得到的新 namespace（列表等可变值也是新对象），
+    调用方可以放心修改。跨进程时还会在
+    YAML 旁写一份 ``<cfg>.pkl``，记录对应的文件版本，版本一致时直接读取。
+
     Args:
         cfg_path: Path to the YAML configuration file.
 
     Returns:
         SimpleNamespace: nested namespace reflecting YAML hierarchy.
+
+    Raises:
+        FileNotFoundError: if *cfg_path* does not exist.
+        ValueError: if the top-level YAML node is not a mapping.
     """
     path = Path(cfg_path)
     if not path.exists():
         raise FileNotFoundError(f"Config file not found: {cfg_path}")
 
-    with path.open("r", encoding="utf-8") as f:
-        raw_cfg = yaml.load(f, Loader=yaml.FullLoader) or {}
+    key = str(path.resolve())
+    stamp = file_stamp(path.stat())
+
+    cached = _CACHE.get(key)
+    if cached is not None and cached[0] == stamp:
+        _CACHE.move_to_end(key)
+        return _dict_to_namespace(copy.deepcopy(cached[1]))
+
+    raw_cfg = read_sidecar(path, stamp)
+    if not isinstance(raw_cfg, dict):
+        with path.open("r", encoding="utf-8") as f:
+            raw_cfg = yaml.load(f.read(), Loader=_Loader)
+        if raw_cfg is None:  # 空文件
+            raw_cfg = {}
+        elif not isinstance(raw_cfg, dict):
+            raise ValueError(
+                f"Config file must contain a mapping at top level, got "
+                f"{type(raw_cfg).__name__}: {cfg_path}"
+            )
+        write_sidecar(path, stamp, raw_cfg)
+
+    _CACHE[key] = (stamp, raw_cfg)
+    _CACHE.move_to_end(key)
+    while len(_CACHE) > _CACHE_SIZE:
+        _CACHE.popitem(last=False)
 
-    return _dict_to_namespace(raw_cfg) 
\ No newline at end of file
+    return _dict_to_namespace(copy.deepcopy(raw_cfg))
@@ -7,207 +7,378 @@ GNTM 诊断和错误处理模块
 
 import sys
 import os
+import re
+import codecs
+import functools
 from pathlib import Path
 from typing import List, Tuple, Optional
 import traceback
 
+FONT_EXTENSIONS = frozenset({'.ttf', '.otf', '.ttc'})
+
+CORE_FILES = (
+    "run.py",
+    "configs/config.yaml",
+    "requirements.txt",
+    "core/__init__.py",
+)
+REQUIRED_DIRS = ("fonts", "texts", "bg", "generators", "core")
+# 上面各路径的父目录；增删其中的条目会改变父目录的 mtime
+_ENV_PARENTS = tuple(sorted({os.path.dirname(p) for p in CORE_FILES + REQUIRED_DIRS}))
+
+
+def _entry_names(directory: str) -> frozenset:
+    """返回目录下的所有条目名（目录不存在时为空）"""
+    try:
+        with os.scandir(directory) as entries:
+            return frozenset(entry.name for entry in entries)
+    except OSError:
+        return frozenset()
+
+
+def _parent_mtimes(cwd: str) -> Tuple[Optional[int], ...]:
+    """各父目录的 mtime_ns（目录不存在时为 None），作为环境检查缓存键的一部分"""
+    mtimes = []
+    for parent in _ENV_PARENTS:
+        try:
+            mtimes.append(os.stat(os.path.join(cwd, parent)).st_mtime_ns)
+        except OSError:
+            mtimes.append(None)
+    return tuple(mtimes)
+
+
+@functools.lru_cache(maxsize=1)
+def _check_environment(cwd: str, mtimes: Tuple[Optional[int], ...]) -> Tuple[Tuple[str, bool, str], ...]:
+    """check_environment 的实现，按工作目录和父目录 mtime 缓存；每个父目录只 scandir 一次"""
+    checks = []
+    
+    # Python版本检查
+    py_version = sys.version_info
+    py_ok = py_version >= (3, 7)
+    py_msg = f"Python {py_version.major}.{py_version.minor}.{py_version.micro}"
+    if not py_ok:
+        py_msg += " (需要 3.7+)"
+    checks.append(("Python版本", py_ok, py_msg))
+    
+    listings = {}
+    
+    def exists(rel_path: str) -> bool:
+        parent, name = os.path.split(rel_path)
+        parent = os.path.join(cwd, parent)
+        if parent not in listings:
+            listings[parent] = _entry_names(parent)
+        return name in listings[parent]
+    
+    # 核心文件检查
+    for file_path in CORE_FILES:
+        ok = exists(file_path)
+        checks.append((f"核心文件 {file_path}", ok, "存在" if ok else "缺失"))
+    
+    # 目录结构检查
+    for dir_path in REQUIRED_DIRS:
+        ok = exists(dir_path)
+        checks.append((f"目录 {dir_path}", ok, "存在" if ok else "缺失"))
+    
+    return tuple(checks)
+
+# str.strip() 会去掉的全部空白字符（即 str.isspace() 为真的字符）中除 \n、\r 以外的部分
+_STRIP_CHARS = ('\t\x0b\x0c\x1c\x1d\x1e\x1f \x85\xa0\u1680'
+                '\u2000\u2001\u2002\u2003\u2004\u2005\u2006\u2007\u2008\u2009\u200a'
+                '\u2028\u2029\u202f\u205f\u3000')
+# 空白行：与 run.load_corpus 的规则一致，strip() 后为空的行视为空白。
+# load_corpus 用 read_text() 读取（通用换行模式），\r\n 和单独的 \r 都会换成 \n，
+# 这里先做同样的替换再按 \n 分行
+_BLANK_LINE_RE = re.compile(
+    rb'^(?:' + b'|'.join(re.escape(c.encode('utf-8')) for c in _STRIP_CHARS) + rb')*\n',
+    re.M,
+)
+_CHUNK_SIZE = 1 << 20
+
+
+def _count_nonblank_lines(path: Path) -> int:
+    """以二进制分块读取，统计非空白行数，无需解码整份语料。
+    分行和空白规则与 run.load_corpus 相同；仅含无法解码字节的行例外（那里会被忽略）。
+    """
+    total = 0
+    blank = 0
+    tail = b''
+    # 尚未结束的当前行，在已被压缩掉的部分中是否出现过可见字符
+    visible = False
+    with open(path, 'rb') as f:
+        first = True
+        while True:
+            chunk = f.read(_CHUNK_SIZE)
+            if not chunk:
+                break
+            if first:
+                chunk = chunk[3:] if chunk.startswith(codecs.BOM_UTF8) else chunk
+                first = False
+            data = tail + chunk
+            # 块末的 \r 可能与下一块开头的 \n 组成 \r\n，留到下一块再替换
+            held = data.endswith(b'\r')
+            if held:
+                data = data[:-1]
+            data = data.replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+            cut = data.rfind(b'\n') + 1
+            if cut:
+                complete, tail = data[:cut], data[cut:]
+                total += complete.count(b'\n')
+                blank += len(_BLANK_LINE_RE.findall(complete))
+                # 第一行的前半段已被压缩掉且含可见字符，不算空白行
+                if visible and _BLANK_LINE_RE.match(complete):
+                    blank -= 1
+                visible = False
+            else:
+                tail = data
+            if len(tail) > _CHUNK_SIZE:
+                visible, tail = _compact_tail(tail, visible)
+            if held:
+                tail += b'\r'
+    # 文件末尾留下的 \r 就是最后一行的行尾
+    if tail.endswith(b'\r'):
+        tail = tail[:-1]
+    # 最后一行（没有换行符，或以 \r 结尾）
+    if visible or (tail and not _BLANK_LINE_RE.fullmatch(tail + b'\n')):
+        total += 1
+    return total - blank
+
+def _compact_tail(tail: bytes, visible: bool) -> Tuple[bool, bytes]:
+    """压缩尚未遇到换行符的超长行，使内存占用与分块大小同阶。
+
+    只需知道这一行是否含可见字符：把结果并入 visible 标记后，只保留末尾
+    被分块截断、尚不完整的 UTF-8 字符，返回 (visible, 剩余字节)。
+    """
+    complete, incomplete = _split_incomplete_utf8(tail)
+    if not visible:
+        visible = not _BLANK_LINE_RE.fullmatch(complete + b'\n')
+    return visible, incomplete
+
+def _split_incomplete_utf8(data: bytes) -> Tuple[bytes, bytes]:
+    """把 data 末尾不完整的 UTF-8 多字节序列切出来，返回 (完整部分, 不完整部分)"""
+    for i in range(1, min(4, len(data)) + 1):
+        lead = data[-i]
+        if lead & 0xC0 == 0x80:  # 续字节，继续向前找首字节
+            continue
+        need = 4 if lead >= 0xF0 else 3 if lead >= 0xE0 else 2 if lead >= 0xC0 else 1
+        if i < need:
+            return data[:-i], data[-i:]
+        break
+    return data, b''
+
+
+@functools.lru_cache(maxsize=8)
+def _check_fonts(font_dir: str, display: str, mtime_ns: int) -> Tuple[bool, Tuple[str, ...], str]:
+    """check_fonts 的实现；键中包含目录 mtime，增删字体后自动失效"""
+    # 单次 scandir 按后缀过滤，代替每种后缀各 glob 一次
+    try:
+        with os.scandir(font_dir) as entries:
+            font_names = tuple(sorted(
+                entry.name for entry in entries
+                if os.path.splitext(entry.name)[1].lower() in FONT_EXTENSIONS
+                and entry.is_file()
+            ))
+    except NotADirectoryError:
+        font_names = ()
+    
+    if not font_names:
+        return False, (), f"字体目录为空: {display}"
+    
+    return True, font_names, f"找到 {len(font_names)} 个字体文件"
+
+
+@functools.lru_cache(maxsize=16)
+def _count_corpus_lines(path: str, mtime_ns: int, size: int) -> int:
+    """按 (路径, mtime, 大小) 缓存的行数统计；读取失败时抛出异常，不会被缓存"""
+    return _count_nonblank_lines(Path(path))
+
+# 常见错误类型和建议
+_ERROR_SUGGESTIONS = {
+    "FileNotFoundError": {
+        "description": "文件或目录不存在",
+        "solutions": [
+            "检查文件路径是否正确",
+            "确保文件确实存在",
+            "运行 'python setup.py' 创建必要文件"
+        ]
+    },
+    "UnicodeDecodeError": {
+        "description": "文本编码问题", 
+        "solutions": [
+            "确保文本文件使用 UTF-8 编码保存",
+            "检查文件是否包含特殊字符",
+            "尝试用记事本另存为 UTF-8 格式"
+        ]
+    },
+    "OSError": {
+        "description": "系统操作错误",
+        "solutions": [
+            "检查磁盘空间是否充足",
+            "确保有足够的权限访问文件",
+            "检查路径长度是否过长"
+        ]
+    },
+    "MemoryError": {
+        "description": "内存不足",
+        "solutions": [
+            "减少 --count 参数值",
+            "降低图片尺寸 --size",
+            "减少进程数 --num_workers"
+        ]
+    },
+    "ImportError": {
+        "description": "依赖包缺失",
+        "solutions": [
+            "运行 'pip install -r requirements.txt'",
+            "检查Python环境是否正确",
+            "尝试重新安装依赖包"
+        ]
+    }
+}
+
+_DEFAULT_SUGGESTION = {
+    "description": "未知错误",
+    "solutions": [
+        "检查控制台错误信息",
+        "确保所有依赖正确安装",
+        "尝试使用 --verbose 查看详细信息"
+    ]
+}
+
+
+def _render_block(suggestion: dict) -> str:
+    """把建议预先渲染成模板，只留 {etype} / {emsg} 待填"""
+    def esc(text: str) -> str:
+        return text.replace("{", "{{").replace("}", "}}")
+    
+    parts = ["\n❌ 错误类型: {etype}\n",
+             f"📝 错误描述: {esc(suggestion['description'])}\n",
+             "💬 错误信息: {emsg}\n\n💡 解决建议:\n"]
+    for i, solution in enumerate(suggestion['solutions'], 1):
+        parts.append(f"   {i}. {esc(solution)}\n")
+    return "".join(parts)
+
+
+_ERROR_TEMPLATES = {name: _render_block(s) for name, s in _ERROR_SUGGESTIONS.items()}
+_DEFAULT_ERROR_TEMPLATE = _render_block(_DEFAULT_SUGGESTION)
+
+_HINT_RE = re.compile(r"(?P<font>font)|(?P<text>corpus|text)", re.IGNORECASE)
+_FONT_HINT = ("\n🔤 字体相关问题:\n"
+              "   - 确保 fonts/ 目录下有字体文件\n"
+              "   - 检查字体文件格式 (.ttf, .otf)\n"
+              "   - 尝试使用系统默认字体\n")
+_TEXT_HINT = ("\n📝 文本相关问题:\n"
+              "   - 确保语料库文件存在且不为空\n"
+              "   - 检查文件编码是否为 UTF-8\n"
+              "   - 尝试使用示例文件测试\n")
+
 class GTNMDiagnostics:
     """GNTM 诊断工具类"""
     
     @staticmethod
     def check_environment() -> List[Tuple[str, bool, str]]:
         """检查运行环境"""
-        checks = []
-        
-        # Python版本检查
-        py_version = sys.version_info
-        py_ok = py_version >= (3, 7)
-        py_msg = f"Python {py_version.major}.{py_version.minor}.{py_version.micro}"
-        if not py_ok:
-            py_msg += " (需要 3.7+)"
-        checks.append(("Python版本", py_ok, py_msg))
-        
-        # 核心文件检查
-        core_files = [
-            "run.py",
-            "configs/config.yaml", 
-            "requirements.txt",
-            "core/__init__.py"
-        ]
-        
-        for file_path in core_files:
-            exists = Path(file_path).exists()
-            checks.append((f"核心文件 {file_path}", exists, "存在" if exists else "缺失"))
-        
-        # 目录结构检查
-        required_dirs = ["fonts", "texts", "bg", "generators", "core"]
-        for dir_path in required_dirs:
-            exists = Path(dir_path).exists()
-            checks.append((f"目录 {dir_path}", exists, "存在" if exists else "缺失"))
-        
-        return checks
+        cwd = os.getcwd()
+        return list(_check_environment(cwd, _parent_mtimes(cwd)))
     
     @staticmethod
     def check_fonts(font_dir: str = "ch") -> Tuple[bool, List[str], str]:
         """检查字体文件"""
         font_path = Path(f"fonts/{font_dir}")
         
-        if not font_path.exists():
+        try:
+            st = font_path.stat()
+        except OSError:
             return False, [], f"字体目录不存在: {font_path}"
         
-        font_extensions = ['.ttf', '.otf', '.ttc']
-        font_files = []
-        
-        for ext in font_extensions:
-            font_files.extend(font_path.glob(f"*{ext}"))
-        
-        if not font_files:
-            return False, [], f"字体目录为空: {font_path}"
-        
-        font_names = [f.name for f in font_files]
-        return True, font_names, f"找到 {len(font_files)} 个字体文件"
+        ok, font_names, msg = _check_fonts(str(font_path.resolve()), str(font_path), st.st_mtime_ns)
+        return ok, list(font_names), msg
     
     @staticmethod
     def check_corpus(corpus_path: str) -> Tuple[bool, int, str]:
         """检查语料库文件"""
         path = Path(corpus_path)
         
-        if not path.exists():
+        try:
+            st = path.stat()
+        except OSError:
             return False, 0, f"语料库文件不存在: {corpus_path}"
         
         try:
-            with open(path, 'r', encoding='utf-8-sig') as f:
-                lines = [line.strip() for line in f if line.strip()]
+            count = _count_corpus_lines(str(path.resolve()), st.st_mtime_ns, st.st_size)
             
-            if not lines:
+            if not count:
                 return False, 0, "语料库文件为空"
             
-            return True, len(lines), f"包含 {len(lines)} 行有效文本"
+            return True, count, f"包含 {count} 行有效文本"
             
         except Exception as e:
             return False, 0, f"读取语料库失败: {e}"
     
+    @staticmethod
+    def invalidate():
+        """清空各项检查的缓存结果（例如修复环境后重新诊断）"""
+        _check_environment.cache_clear()
+        _check_fonts.cache_clear()
+        _count_corpus_lines.cache_clear()
+    
     @staticmethod
     def diagnose_error(error: Exception) -> str:
         """诊断错误并提供解决建议"""
         error_type = type(error).__name__
         error_msg = str(error)
         
-        # 常见错误类型和建议
-        error_suggestions = {
-            "FileNotFoundError": {
-                "description": "文件或目录不存在",
-                "solutions": [
-                    "检查文件路径是否正确",
-                    "确保文件确实存在",
-                    "运行 'python setup.py' 创建必要文件"
-                ]
-            },
-            "UnicodeDecodeError": {
-                "description": "文本编码问题", 
-                "solutions": [
-                    "确保文本文件使用 UTF-8 编码保存",
-                    "检查文件是否包含特殊字符",
-                    "尝试用记事本另存为 UTF-8 格式"
-                ]
-            },
-            "OSError": {
-                "description": "系统操作错误",
-                "solutions": [
-                    "检查磁盘空间是否充足",
-                    "确保有足够的权限访问文件",
-                    "检查路径长度是否过长"
-                ]
-            },
-            "MemoryError": {
-                "description": "内存不足",
-                "solutions": [
-                    "减少 --count 参数值",
-                    "降低图片尺寸 --size",
-                    "减少进程数 --num_workers"
-                ]
-            },
-            "ImportError": {
-                "description": "依赖包缺失",
-                "solutions": [
-                    "运行 'pip install -r requirements.txt'",
-                    "检查Python环境是否正确",
-                    "尝试重新安装依赖包"
-                ]
-            }
-        }
-        
-        suggestion = error_suggestions.get(error_type, {
-            "description": "未知错误",
-            "solutions": [
-                "检查控制台错误信息",
-                "确保所有依赖正确安装",
-                "尝试使用 --verbose 查看详细信息"
-            ]
-        })
-        
-        diagnosis = f"""
-❌ 错误类型: {error_type}
-📝 错误描述: {suggestion['description']}
-💬 错误信息: {error_msg}
-
-💡 解决建议:
-"""
-        for i, solution in enumerate(suggestion['solutions'], 1):
-            diagnosis += f"   {i}. {solution}\n"
+        template = _ERROR_TEMPLATES.get(error_type, _DEFAULT_ERROR_TEMPLATE)
+        diagnosis = template.format(etype=error_type, emsg=error_msg)
         
         # 特殊情况的额外建议
-        if "font" in error_msg.lower():
-            diagnosis += "\n🔤 字体相关问题:\n"
-            diagnosis += "   - 确保 fonts/ 目录下有字体文件\n"
-            diagnosis += "   - 检查字体文件格式 (.ttf, .otf)\n"
-            diagnosis += "   - 尝试使用系统默认字体\n"
-        
-        if "corpus" in error_msg.lower() or "text" in error_msg.lower():
-            diagnosis += "\n📝 文本相关问题:\n"
-            diagnosis += "   - 确保语料库文件存在且不为空\n"
-            diagnosis += "   - 检查文件编码是否为 UTF-8\n"
-            diagnosis += "   - 尝试使用示例文件测试\n"
+        hints = {m.lastgroup for m in _HINT_RE.finditer(error_msg)}
+        if "font" in hints:
+            diagnosis += _FONT_HINT
+        if "text" in hints:
+            diagnosis += _TEXT_HINT
         
         return diagnosis
     
     @staticmethod
     def create_diagnostic_report() -> str:
         """创建完整的诊断报告"""
-        report = "🔍 GNTM 系统诊断报告\n"
-        report += "=" * 50 + "\n\n"
+        parts = ["🔍 GNTM 系统诊断报告\n", "=" * 50 + "\n\n"]
         
         # 环境检查
-        report += "📋 环境检查:\n"
+        parts.append("📋 环境检查:\n")
         checks = GTNMDiagnostics.check_environment()
         for name, status, message in checks:
             status_icon = "✅" if status else "❌"
-            report += f"   {status_icon} {name}: {message}\n"
+            parts.append(f"   {status_icon} {name}: {message}\n")
         
         # 字体检查
-        report += "\n🔤 字体检查:\n"
+        parts.append("\n🔤 字体检查:\n")
         for font_dir in ["ch", "en"]:
             ok, fonts, msg = GTNMDiagnostics.check_fonts(font_dir)
             status_icon = "✅" if ok else "❌"
-            report += f"   {status_icon} fonts/{font_dir}/: {msg}\n"
-            if ok and len(fonts) <= 3:
-                for font in fonts:
-                    report += f"      - {font}\n"
-            elif ok and len(fonts) > 3:
-                for font in fonts[:3]:
-                    report += f"      - {font}\n"
-                report += f"      ... 还有 {len(fonts) - 3} 个字体\n"
+            parts.append(f"   {status_icon} fonts/{font_dir}/: {msg}\n")
+            if ok:
+                parts.extend(f"      - {font}\n" for font in fonts[:3])
+                if len(fonts) > 3:
+                    parts.append(f"      ... 还有 {len(fonts) - 3} 个字体\n")
         
         # 语料库检查
-        report += "\n📝 语料库检查:\n"
+        parts.append("\n📝 语料库检查:\n")
         for corpus in ["texts/Company-Shorter-Form1000.txt", "texts/sample_chinese.txt", "texts/sample_english.txt"]:
             if Path(corpus).exists():
                 ok, count, msg = GTNMDiagnostics.check_corpus(corpus)
                 status_icon = "✅" if ok else "❌"
-                report += f"   {status_icon} {corpus}: {msg}\n"
+                parts.append(f"   {status_icon} {corpus}: {msg}\n")
         
-        report += "\n" + "=" * 50 + "\n"
-        return report
+        parts.append("\n" + "=" * 50 + "\n")
+        return "".join(parts)
+
+_HELP_FOOTER = (
+    "\n📋 如需更多帮助:\n"
+    "   1. 运行诊断: python -c \"from core.diagnostics import GTNMDiagnostics; print(GTNMDiagnostics.create_diagnostic_report())\"\n"
+    "   2. 查看文档: cat README.md\n"
+    "   3. 尝试快速开始: python run.py --quick-start\n"
+)
 
 def handle_exception(exc_type, exc_value, exc_traceback):
     """全局异常处理器"""
@@ -216,23 +387,22 @@ def handle_exception(exc_type, exc_value, exc_traceback):
         print("\n❌ 程序被用户中断")
         sys.exit(0)
     
-    print("\n" + "="*60)
-    print("❌ GNTM 运行时发生错误")
-    print("="*60)
-    
-    # 显示友好的错误诊断
+    # 显示友好的错误诊断（整块一次写出）
     diagnosis = GTNMDiagnostics.diagnose_error(exc_value)
-    print(diagnosis)
-    
-    print("\n🔍 详细错误信息:")
+    sys.stdout.write("".join([
+        "\n", "=" * 60, "\n",
+        "❌ GNTM 运行时发生错误\n",
+        "=" * 60, "\n",
+        diagnosis, "\n",
+        "\n🔍 详细错误信息:\n",
+    ]))
+    sys.stdout.flush()
     traceback.print_exception(exc_type, exc_value, exc_traceback)
     
-    print("\n📋 如需更多帮助:")
-    print("   1. 运行诊断: python -c \"from core.diagnostics import GTNMDiagnostics; print(GTNMDiagnostics.create_diagnostic_report())\"")
-    print("   2. 查看文档: cat README.md")
-    print("   3. 尝试快速开始: python run.py --quick-start")
+    sys.stdout.write(_HELP_FOOTER)
     
     sys.exit(1)
 
-# 注册全局异常处理器
-sys.excepthook = handle_exception
+def install_excepthook():
+    """注册全局异常处理器（仅由 CLI 入口调用，导入本模块不再有副作用）"""
+    sys.excepthook = handle_exception
@@ -4,18 +4,30 @@ from typing import Optional
 
 __all__ = ["setup_logger"]
 
+_DEFAULT_FMT = "[%(levelname)s] %(message)s"
+
 def setup_logger(name: str = "data_gen", level: int = logging.INFO, fmt: Optional[str] = None):
     """Return a configured ``logging.Logger`` instance.
 
     Repeated calls with the same ``name`` will return the existing logger.
+    请使用 ``logger.debug("%s", value)`` 形式传参，被级别过滤掉的记录不会做字符串格式化。
     """
     logger = logging.getLogger(name)
     if logger.handlers:
         return logger  # Already configured
 
+    fmt = fmt or _DEFAULT_FMT
+    # 格式中未用到的线程/进程字段不再逐条记录采集
+    if "%(thread" not in fmt:
+        logging.logThreads = False
+    if "%(process)" not in fmt:
+        logging.logProcesses = False
+    if "%(processName" not in fmt:
+        logging.logMultiprocessing = False
+
     logger.setLevel(level)
     handler = logging.StreamHandler(stream=sys.stdout)
-    formatter = logging.Formatter(fmt or "[%(levelname)s] %(message)s")
+    formatter = logging.Formatter(fmt)
     handler.setFormatter(formatter)
     logger.addHandler(handler)
-    return logger 
\ No newline at end of file
+    return logger
\ No newline at end of file
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+示例脚本共用的 run.py 调用方式
+默认在当前进程内调用 run.main，省去启动子进程和重复导入的开销；
+设置环境变量 GNTM_NO_INPROC，或当前环境导入 run 失败时，改为启动 run.py 子进程。
+"""
+
+import os
+import sys
+import subprocess
+from pathlib import Path
+
+# 让 examples/ 下的脚本也能导入项目根目录的 run.py
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+def run_gntm(argv):
+    """按 argv 运行一次 run.py，返回是否成功"""
+    run_main = None
+    if not os.environ.get("GNTM_NO_INPROC"):
+        try:
+            from run import main as run_main
+        except ImportError:  # 依赖缺失时退回到子进程方式
+            run_main = None
+
+    try:
+        if run_main is not None:
+            run_main(argv)
+        else:
+            subprocess.run([sys.executable, "run.py", *argv], check=True)
+    except SystemExit as e:
+        if e.code:
+            print(f"❌ 生成失败：退出码 {e.code}")
+            return False
+    except subprocess.CalledProcessError as e:
+        print(f"❌ 生成失败：{e}")
+        return False
+    except Exception as e:
+        print(f"❌ 生成出错: {e}")
+        return False
+    return True
@@ -5,30 +5,33 @@ GNTM 批量生成示例
 演示如何批量生成不同语言和样式的数据集
 """
 
+import os
 import sys
-import subprocess
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 import time
 
-def generate_dataset(name, **kwargs):
-    """生成单个数据集"""
-    print(f"\n🔄 生成 {name} 数据集...")
-    
-    # 构建命令
-    cmd = [sys.executable, "run.py"]
-    
+from _runner import run_gntm
+
+def build_argv(**kwargs):
+    """把数据集配置转换为 run.py 的命令行参数列表"""
+    argv = []
     for key, value in kwargs.items():
-        cmd.extend([f"--{key}", str(value)])
-    
-    try:
-        start_time = time.time()
-        subprocess.run(cmd, check=True)
-        duration = time.time() - start_time
+        argv.extend([f"--{key}", str(value)])
+    return argv
+
+def run_dataset(argv):
+    """执行一次 run.py，返回 (是否成功, 用时)"""
+    start_time = time.perf_counter()
+    ok = run_gntm(argv)
+    return ok, time.perf_counter() - start_time
+
+def report_dataset(name, ok, duration):
+    """打印单个数据集的生成结果"""
+    if ok:
         print(f"✅ {name} 数据集生成完成 (用时: {duration:.2f}秒)")
-        return True
-    except subprocess.CalledProcessError as e:
-        print(f"❌ {name} 数据集生成失败：{e}")
-        return False
+    else:
+        print(f"❌ {name} 数据集生成失败")
 
 def main():
     print("🚀 GNTM 批量生成示例")
@@ -84,14 +87,24 @@ def main():
     print(f"\n📋 计划生成 {len(datasets)} 个数据集")
     
     success_count = 0
-    total_start_time = time.time()
+    total_start_time = time.perf_counter()
     
+    # 各数据集互不依赖，放进进程池并行生成；
+    # 每个数据集的内部进程数按 CPU 平均分配，避免超额订阅
+    cpu_count = os.cpu_count() or 1
+    max_workers = min(len(datasets), 4, cpu_count)
+    names = [dataset.pop("name") for dataset in datasets]
+    argvs = []
     for dataset in datasets:
-        name = dataset.pop("name")
-        if generate_dataset(name, **dataset):
-            success_count += 1
+        dataset.setdefault("num_workers", max(1, cpu_count // max_workers))
+        argvs.append(build_argv(**dataset))
+    
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        for name, (ok, duration) in zip(names, executor.map(run_dataset, argvs)):
+            report_dataset(name, ok, duration)
+            success_count += ok
     
-    total_duration = time.time() - total_start_time
+    total_duration = time.perf_counter() - total_start_time
     
     print(f"\n🎉 批量生成完成！")
     print(f"✅ 成功: {success_count}/{len(datasets)} 个数据集")
@@ -6,10 +6,16 @@ GNTM 自定义配置示例
 """
 
 import sys
-import subprocess
 import yaml
 from pathlib import Path
 
+try:
+    from yaml import CSafeDumper as _Dumper
+except ImportError:  # libyaml 未编译时退回纯 Python 实现
+    from yaml import SafeDumper as _Dumper
+
+from _runner import run_gntm
+
 def create_custom_config():
     """创建自定义配置文件"""
     config = {
@@ -50,7 +56,8 @@ def create_custom_config():
     config_path.parent.mkdir(exist_ok=True)
     
     with open(config_path, 'w', encoding='utf-8') as f:
-        yaml.dump(config, f, allow_unicode=True, default_flow_style=False)
+        yaml.dump(config, f, Dumper=_Dumper, allow_unicode=True,
+                  default_flow_style=False, sort_keys=False)
     
     return config_path
 
@@ -77,21 +84,17 @@ def main():
     
     print(f"\n🔄 使用自定义配置生成图片...")
     
-    cmd = [
-        sys.executable, "run.py", 
+    argv = [
         "--cfg", str(config_path),
         "--verbose"
     ]
     
-    try:
-        subprocess.run(cmd, check=True)
-        print("\n✅ 自定义配置示例完成！")
-        print("📁 请查看 output/custom/ 目录")
-        print("💡 注意观察红色文字和黑色描边效果")
-        return True
-    except subprocess.CalledProcessError as e:
-        print(f"❌ 生成失败：{e}")
+    if not run_gntm(argv):
         return False
+    print("\n✅ 自定义配置示例完成！")
+    print("📁 请查看 output/custom/ 目录")
+    print("💡 注意观察红色文字和黑色描边效果")
+    return True
 
 if __name__ == "__main__":
     success = main()
@@ -6,9 +6,10 @@ GNTM 快速开始示例
 """
 
 import sys
-import subprocess
 from pathlib import Path
 
+from _runner import run_gntm
+
 def main():
     print("🚀 GNTM 快速开始示例")
     print("这个脚本将生成100张示例图片")
@@ -21,22 +22,17 @@ def main():
     
     print("\n⚙️ 使用快速开始模式...")
     
-    cmd = [
-        sys.executable, "run.py",
+    argv = [
         "--quick-start",
         "--verbose"
     ]
     
-    try:
-        print("🔄 正在生成...")
-        subprocess.run(cmd, check=True)
-        print("\n✅ 快速开始示例完成！")
-        print("📁 请查看 output/images/ 目录")
-        print("📄 标签文件: output/label.txt")
-    except subprocess.CalledProcessError as e:
-        print(f"❌ 生成失败：{e}")
+    print("🔄 正在生成...")
+    if not run_gntm(argv):
         return False
-    
+    print("\n✅ 快速开始示例完成！")
+    print("📁 请查看 output/images/ 目录")
+    print("📄 标签文件: output/label.txt")
     return True
 
 if __name__ == "__main__":
@@ -1,3 +1,4 @@
+import os
 import random as rnd
 import numpy as np
 from pathlib import Path
@@ -65,11 +66,12 @@ class FakeTextDataGenerator:
         text_color,
         orientation,
         space_width,
-        margins,               # "top,left,bottom,right"
+        margins,               # (top, left, bottom, right) 或字符串 "top,left,bottom,right"
         fit,
         stroke_width,
         stroke_fill,
-        height=0               # 若>0，则最终图像高度 = height
+        height=0,              # 若>0，则最终图像高度 = height
+        shard_size=0           # 若>0，第 index 张图片保存到 out_dir/{index // shard_size:04d}/
     ):
         """
         1) 生成文字图 (text_img)
@@ -80,7 +82,9 @@ class FakeTextDataGenerator:
         """
 
         # ----0. 解析边距----
-        margin_top, margin_left, margin_bottom, margin_right = map(int, margins.split(','))
+        if isinstance(margins, str):
+            margins = margins.split(',')
+        margin_top, margin_left, margin_bottom, margin_right = map(int, margins)
         horizontal_margin = margin_left + margin_right
         vertical_margin = margin_top + margin_bottom
 
@@ -164,10 +168,16 @@ class FakeTextDataGenerator:
 
         # ----5. 保存图像----
         out_dir = Path(out_dir)
-        out_dir.mkdir(parents=True, exist_ok=True)
+        # 分目录保存，避免单个目录下文件过多；label.txt 仍写在 out_dir 的上一级
+        save_dir = out_dir / f"{index // shard_size:04d}" if shard_size > 0 else out_dir
+        save_dir.mkdir(parents=True, exist_ok=True)
         image_name = f"{str(index).zfill(8)}.{extension}"
-        save_path = out_dir / image_name
-        final_img.save(save_path, quality=95)
+        save_path = save_dir / image_name
+        # 先写入同目录的隐藏临时文件再原子替换，其他进程（如 Web 预览）
+        # 只会看到完整的图片；临时名保留扩展名，PIL 仍按它推断格式
+        tmp_path = save_dir / f".tmp-{image_name}"
+        final_img.save(tmp_path, quality=95)
+        os.replace(tmp_path, save_path)
 
         # ----6. 写 label.txt----
         parent_dir = out_dir.parent
@@ -2,6 +2,37 @@ import random as rnd  # 引入随机模块，用于生成随机数。
 import numpy as np  # 引入NumPy模块，尽管这里代码中没有用到它。
 from pathlib import Path
 from PIL import Image, ImageColor, ImageFont, ImageDraw, ImageFilter  # 从Pillow库导入图像处理相关模块。
+import threading
+from collections import OrderedDict
+
+# 已打开的字体: (字体路径, 字号) -> FreeTypeFont。按线程各存一份，FreeType 对象不跨线程共享
+_font_cache = threading.local()
+# 每个线程最多缓存的字体数；常驻进程（Web 生成器）会反复换字体和字号，需要上限
+FONT_CACHE_SIZE = 64
+
+def load_font(font_path, font_size):
+    """返回缓存的 FreeTypeFont，同一线程内每个 (字体, 字号) 只解析一次字体文件。
+    超过 FONT_CACHE_SIZE 时淘汰最久未用的字体。"""
+    fonts = _font_cache.__dict__.setdefault('fonts', OrderedDict())
+    key = (font_path, font_size)
+    font = fonts.get(key)
+    if font is None:
+        font = fonts[key] = ImageFont.truetype(font=font_path, size=font_size)
+        if len(fonts) > FONT_CACHE_SIZE:
+            fonts.popitem(last=False)
+    else:
+        fonts.move_to_end(key)
+    return font
+
+def find_broken_fonts(font_list, font_size):
+    """逐个试开 font_list 中的字体（不写入缓存），返回打不开的 [(字体路径, 异常)]。"""
+    broken = []
+    for font_path in font_list:
+        try:
+            ImageFont.truetype(font=font_path, size=font_size)
+        except OSError as e:
+            broken.append((font_path, e))
+    return broken
 
 # 主函数，用于生成文字图像及其字符边界框。
 def generate(out_dir, text, font_list, text_color, font_size, orientation, space_width, 
@@ -50,11 +81,11 @@ def _generate_horizontal_text(
 
     # 1. 随机选择一个主字体
     main_font_path = rnd.choice(font_list)
-    main_font = ImageFont.truetype(font=main_font_path, size=font_size)
+    main_font = load_font(main_font_path, font_size)
 
     # 2. 初始化备用字体列表
     backup_fonts = [
-        ImageFont.truetype(font=f, size=font_size)
+        load_font(f, font_size)
         for f in font_list
         if f != main_font_path
     ]
@@ -6,23 +6,50 @@
 """
 from __future__ import annotations
 
+import os
 import random
-from typing import Callable, List
+import threading
+from typing import Callable, List, Tuple
 
 import numpy as np
-from PIL import Image, ImageFilter, ImageEnhance
+from PIL import Image, ImageFilter, ImageStat
 
 __all__ = [
     "apply_augmentations",
 ]
 
+# ---------------------------------------------------------------------------
+# 随机数发生器
+# ---------------------------------------------------------------------------
+
+def _new_rng() -> np.random.Generator:
+    """Create a PCG64 generator whose stream is unique to this process."""
+    return np.random.default_rng(np.random.SeedSequence(spawn_key=(os.getpid(),)))
+
+
+_rng = _new_rng()
+
+
+def _reseed_after_fork() -> None:
+    global _rng
+    _rng = _new_rng()
+
+
+# 与标准库 random 一样，fork 出的子进程（multiprocessing 工作进程）重新播种，
+# 避免各进程生成完全相同的噪声
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reseed_after_fork)
+
+# 每个线程复用一块 float32 噪声缓冲区，尺寸变化时才重新分配
+_noise_local = threading.local()
+
 # ---------------------------------------------------------------------------
 # 单项增强函数
 # ---------------------------------------------------------------------------
 
 def _rand_bool(p: float) -> bool:
     """Helper: return True with probability *p* (0~1)."""
-    return random.random() < p
+    return p >= 1.0 or random.random() < p
 
 
 def gaussian_blur(img: Image.Image, p: float = 0.25) -> Image.Image:
@@ -33,18 +60,69 @@ def gaussian_blur(img: Image.Image, p: float = 0.25) -> Image.Image:
     return img.filter(ImageFilter.GaussianBlur(radius))
 
 
+def _enhance_factor() -> float:
+    return random.uniform(0.7, 1.3)  # 1 == original
+
+
+def _tone_lut(img: Image.Image, brightness_factor: float = 1.0,
+              contrast_factor: float = 1.0) -> Image.Image:
+    """Apply brightness then contrast in a single ``Image.point`` pass.
+
+    与 ImageEnhance.Brightness / Contrast 先后调用的效果一致：亮度按系数缩放并
+    截断到 0~255，对比度以调整亮度后图像的灰度均值为中心拉伸。均值由原图直方图
+    经亮度表映射得到，亮度饱和时与先后调用两次 ImageEnhance 相同。
+    """
+    x = np.arange(256, dtype=np.float32) * brightness_factor
+    lut = np.clip(x, 0, 255).astype(np.uint8)
+    if contrast_factor != 1.0:
+        mean = int(_gray_mean(img, lut) + 0.5)
+        x = (lut.astype(np.float32) - mean) * contrast_factor + mean
+        lut = np.clip(x, 0, 255).astype(np.uint8)
+    return _apply_lut(img, lut)
+
+
+_IDENTITY_LUT = list(range(256))
+
+
+def _apply_lut(img: Image.Image, lut: np.ndarray) -> Image.Image:
+    """Map every colour band of *img* through the same 256-entry uint8 *lut*.
+
+    The alpha band keeps the identity table, as ImageEnhance does.
+    """
+    table = lut.tolist()
+    return img.point([v for band in img.getbands()
+                      for v in (_IDENTITY_LUT if band == "A" else table)])
+
+
+_GRAY_WEIGHTS = np.array([0.299, 0.587, 0.114])  # ITU-R 601-2, same as convert("L")
+_LEVELS = np.arange(256)
+
+
+def _gray_mean(img: Image.Image, lut: np.ndarray = _LEVELS) -> float:
+    """Mean luminance of *img* with every colour band mapped through *lut*.
+
+    Computed from the histogram instead of a converted copy.
+    """
+    if img.mode == "L":
+        hist = np.asarray(img.histogram(), dtype=np.float64)
+        return float(hist @ lut / hist.sum())
+    if img.mode in ("RGB", "RGBA"):
+        hist = np.asarray(img.histogram(), dtype=np.float64)[:768].reshape(3, 256)
+        band_means = hist @ lut / hist.sum(axis=1)
+        return float(band_means @ _GRAY_WEIGHTS)
+    return ImageStat.Stat(img.convert("L").point(lut.tolist())).mean[0]
+
+
 def brightness(img: Image.Image, p: float = 0.3) -> Image.Image:
     if not _rand_bool(p):
         return img
-    factor = random.uniform(0.7, 1.3)  # 1 == original
-    return ImageEnhance.Brightness(img).enhance(factor)
+    return _tone_lut(img, brightness_factor=_enhance_factor())
 
 
 def contrast(img: Image.Image, p: float = 0.3) -> Image.Image:
     if not _rand_bool(p):
         return img
-    factor = random.uniform(0.7, 1.3)
-    return ImageEnhance.Contrast(img).enhance(factor)
+    return _tone_lut(img, contrast_factor=_enhance_factor())
 
 
 def add_gaussian_noise(img: Image.Image, p: float = 0.25, var: float = 8.0) -> Image.Image:
@@ -52,27 +130,50 @@ def add_gaussian_noise(img: Image.Image, p: float = 0.25, var: float = 8.0) -> I
     if not _rand_bool(p):
         return img
 
-    arr = np.asarray(img).astype(np.float32)
-    noise = np.random.normal(0, var, arr.shape).astype(np.float32)
-    arr += noise
-    arr = np.clip(arr, 0, 255).astype(np.uint8)
-    return Image.fromarray(arr, mode=img.mode)
+    arr = np.asarray(img, dtype=np.uint8).astype(np.int16)
+    noise = _noise_buffer(arr.shape)
+    _rng.standard_normal(dtype=np.float32, out=noise)
+    noise *= var
+    np.add(arr, noise, out=arr, casting="unsafe")
+    np.clip(arr, 0, 255, out=arr)
+    return Image.fromarray(arr.astype(np.uint8), mode=img.mode)
+
+
+def _noise_buffer(shape) -> np.ndarray:
+    """Return this thread's reusable float32 buffer of the given *shape*."""
+    buf = getattr(_noise_local, "buf", None)
+    if buf is None or buf.shape != shape:
+        buf = np.empty(shape, dtype=np.float32)
+        _noise_local.buf = buf
+    return buf
 
 
 # ---------------------------------------------------------------------------
 # Pipeline
 # ---------------------------------------------------------------------------
 
-_AUGS: List[Callable[[Image.Image], Image.Image]] = [
-    gaussian_blur,
-    brightness,
-    contrast,
-    add_gaussian_noise,
+_AUGS: List[Tuple[Callable[..., Image.Image], float]] = [
+    (gaussian_blur, 0.25),
+    (brightness, 0.3),
+    (contrast, 0.3),
+    (add_gaussian_noise, 0.25),
 ]
 
 
 def apply_augmentations(img: Image.Image) -> Image.Image:
     """Apply a sequence of random augmentations (order fixed, each with its own prob)."""
-    for fn in _AUGS:
-        img = fn(img)
+    # 先统一掷骰子：全部未命中时直接返回，命中的增强以 p=1.0 调用，不再重复掷骰
+    rolls = [random.random() < p for _, p in _AUGS]
+    if not any(rolls):
+        return img
+    hits = {fn for (fn, _), hit in zip(_AUGS, rolls) if hit}
+    for fn, _ in _AUGS:
+        if fn not in hits:
+            continue
+        if fn is brightness and contrast in hits:
+            # 亮度与对比度同时命中：合并成一张查找表，只遍历一次像素
+            img = _tone_lut(img, _enhance_factor(), _enhance_factor())
+            hits.discard(contrast)
+        else:
+            img = fn(img, p=1.0)
     return img
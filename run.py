@@ -1,41 +1,65 @@
 import argparse
+import functools
+import os
+import re
 import sys
-import yaml
-from easydict import EasyDict as edict
 from pathlib import Path
-from tqdm import tqdm
-from multiprocessing import Pool
 import time
 
-from generators.text_generator import (
-    create_strings_from_dict,
-    create_strings_from_corpus_file,
-    create_strings_randomly_from_chars
-)
-from generators.data_generator import FakeTextDataGenerator
+# 生成相关的重量级模块（PIL / numpy / tqdm / multiprocessing）在真正生成时才导入，
+# --diagnose、--dry_run 等模式无需付出这部分启动开销
+from core.cache import file_stamp, read_sidecar, write_sidecar
 from core.config import load_config
 from core.logger import setup_logger
-from core.diagnostics import GTNMDiagnostics
+from core.diagnostics import FONT_EXTENSIONS, GTNMDiagnostics, install_excepthook
 
 
+# 任务数低于该值时直接单进程生成：进程池的启动和分发开销会超过并行收益
+MIN_TASKS_FOR_POOL = 64
+
+# 图片数超过该值时按序号分子目录保存 (images/0000/, images/0001/, ...)，
+# 避免单个目录过大拖慢文件创建
+SHARD_SIZE = 10000
+
+# 颜色 "(R,G,B)" / "R,G,B"；边距 "n" 或 "上,左,下,右"
+_COLOR_RE = re.compile(r'^\(?\s*(\d+)\s*,\s*(\d+)\s*,\s*(\d+)\s*\)?$')
+_MARGINS_RE = re.compile(r'^\s*(\d+)(?:\s*,\s*(\d+)\s*,\s*(\d+)\s*,\s*(\d+))?\s*$')
+
+def parse_color(color_str):
+    """
+    将颜色字符串转换为 (R, G, B) 整数元组，格式不对时返回 None。
+    示例:
+        "(0,0,0)" -> (0, 0, 0)
+        "255,0,0" -> (255, 0, 0)
+    """
+    m = _COLOR_RE.match(color_str.strip())
+    if m is None:
+        return None
+    return tuple(map(int, m.groups()))
+
+@functools.lru_cache(maxsize=128)
 def parse_margins(margin_str):
     """
     边距就是字符离左右上下边界的距离
-    将逗号分隔的字符串转换为整数列表，用于设置边距。
+    将逗号分隔的字符串转换为整数元组，用于设置边距，格式不对时返回 None。
+    结果会被缓存，因此返回不可变的元组。
     示例:
-        "5" -> [5, 5, 5, 5]
-        "5,10,5,10" -> [5, 10, 5, 10]
+        "5" -> (5, 5, 5, 5)
+        "5,10,5,10" -> (5, 10, 5, 10)
     """
-    margins = margin_str.split(',')
-    if len(margins) == 1:
+    m = _MARGINS_RE.match(margin_str)
+    if m is None:
+        return None
+    if m.group(2) is None:
         # 如果只给定一个值，则四个边距相同
-        return [int(margins[0])] * 4
-    return [int(m) for m in margins]
+        return (int(m.group(1)),) * 4
+    return tuple(map(int, m.groups()))
 
 
-def parse_args():
+def parse_args(argv=None):
     """
     解析命令行参数，返回命名空间对象。
+    argv 为 None 时读取 sys.argv，否则解析给定的参数列表（供脚本内调用）。
     """
     parser = argparse.ArgumentParser(
         description="🚀 GNTM: Generative but Natural TextImage Maker",
@@ -168,6 +192,12 @@ def parse_args():
         help='多进程数量 (推荐: 4-8)', 
         type=int
     )
+    perf_group.add_argument(
+        '--executor',
+        choices=['auto', 'process', 'thread'],
+        default='auto',
+        help='并行方式: process=多进程, thread=多线程, auto=支持 fork 时用多进程，否则用多线程 (默认)'
+    )
     
     # 调试选项
     debug_group = parser.add_argument_group('🔍 调试选项')
@@ -187,13 +217,14 @@ def parse_args():
         help='运行系统诊断检查'
     )
     
-    return parser.parse_args()
+    return parser.parse_args(argv)
 
 def load_fonts(font_or_dir):
     """
     加载指定路径（文件或目录）下的字体列表。
     如果 font_or_dir 是文件，则只返回该文件。
-    如果是目录，则返回目录下所有文件。
+    如果是目录，则返回目录下所有字体文件（按 FONT_EXTENSIONS 后缀过滤，
+    跳过 OFL.txt、LICENSE 等附带文件）。
     """
     p = Path("fonts/"+font_or_dir)
     if not p.exists():
@@ -203,8 +234,11 @@ def load_fonts(font_or_dir):
         # 传入的是一个具体字体文件路径
         return [str(p)]
     else:
-        # 从某个目录加载所有字体
-        font_paths = [str(font) for font in p.glob('*') if font.is_file()]
+        # 从某个目录加载所有字体；DirEntry 自带文件类型信息，无需逐个 stat
+        with os.scandir(p) as entries:
+            font_paths = [entry.path for entry in entries
+                          if os.path.splitext(entry.name)[1].lower() in FONT_EXTENSIONS
+                          and entry.is_file()]
         if not font_paths:
             sys.exit(f"[Error] No font files found in directory: {font_or_dir}")
         return font_paths
@@ -213,19 +247,132 @@ def load_fonts(font_or_dir):
 def load_corpus(corpus_file_path):
     """
     加载语料库文件，返回行列表。
+    解析结果缓存在同目录的 <corpus>.pkl 中，语料未改动时热启动直接反序列化。
     """
     p = Path(corpus_file_path)
     if not p.exists():
         sys.exit(f"[Error] Corpus file not found: {corpus_file_path}")
-    with open(p, 'r', encoding="utf-8-sig", errors='ignore') as file:
-        words_list = [line.strip() for line in file if line.strip()]
-    return words_list
+    stamp = file_stamp(p.stat())
+    lines = read_sidecar(p, stamp)
+    if isinstance(lines, list):
+        return lines
+    # 一次性读入后在 C 层切分，每行只 strip 一次
+    # 用 split('\n') 而非 splitlines()，与逐行读取的分行规则保持一致
+    text = p.read_text(encoding="utf-8-sig", errors='ignore')
+    lines = [line for line in map(str.strip, text.split('\n')) if line]
+    write_sidecar(p, stamp, lines)
+    return lines
+
+def get_pool_context():
+    """
+    Linux 上显式使用 fork 启动工作进程，子进程直接继承已导入的模块，
+    不必像 spawn/forkserver 那样在每个进程里重新导入整个程序。
+    """
+    import multiprocessing
+    if sys.platform.startswith('linux'):
+        return multiprocessing.get_context('fork')
+    return multiprocessing.get_context()
+
+def resolve_executor(executor):
+    """
+    把 --executor auto 解析为 process 或 thread。
+    fork 启动的进程池几乎没有额外开销；spawn/forkserver 需要在每个工作进程里
+    重新导入 PIL / numpy，此时改用线程池（PIL 的图像运算和磁盘写入会释放 GIL）。
+    """
+    if executor != 'auto':
+        return executor
+    return 'process' if get_pool_context().get_start_method() == 'fork' else 'thread'
 
-def worker(param_tuple):
+def create_pool(executor, num_workers, shared_params, text_colors, progress):
+    """
+    创建进程池或线程池。线程共享全局变量，只需在主线程初始化一次。
+    """
+    if executor == 'thread':
+        from multiprocessing.pool import ThreadPool
+        init_worker(shared_params, text_colors, progress)
+        return ThreadPool(processes=num_workers)
+    return get_pool_context().Pool(processes=num_workers,
+                                   initializer=init_worker,
+                                   initargs=(shared_params, text_colors, progress))
+
+def load_generator():
+    """
+    导入图像生成器（会连带导入 PIL / numpy）。
+    主进程在创建进程池前先调用一次，fork 出的工作进程即可直接继承。
+    """
+    from generators.data_generator import FakeTextDataGenerator
+    return FakeTextDataGenerator
+
+# 所有任务共用的生成参数、文字颜色表、生成器和进度计数器，
+# 由 init_worker 在每个工作进程中设置一次
+_SHARED_PARAMS = {}
+_TEXT_COLORS = ()
+_GENERATOR = None
+_PROGRESS = None
+
+def init_worker(shared_params, text_colors, progress=None):
+    """
+    进程池初始化函数：把字体列表、输出目录等不随任务变化的参数保存到
+    工作进程的全局变量中，避免每个任务都重复序列化一遍。
+    text_colors 是颜色表，第 index 张图片使用 text_colors[index % len(text_colors)]。
+    progress 是主进程创建的共享计数器 (multiprocessing.Value)，可为 None。
+    字体不在这里打开：初始化函数抛出异常时进程池会不断重建工作进程，任务永远
+    完成不了。字体由 load_font 在首次使用时打开并缓存，主进程已事先校验过。
+    """
+    global _SHARED_PARAMS, _TEXT_COLORS, _GENERATOR, _PROGRESS
+    _SHARED_PARAMS = shared_params
+    _TEXT_COLORS = tuple(text_colors)
+    _GENERATOR = load_generator()
+    _PROGRESS = progress
+
+def worker(task):
     """
     包装函数，给多进程调用用的。
+    task 只包含随图片变化的参数: (index, text)，颜色由 index 在颜色表中查出。
+    """
+    index, text = task
+    return _GENERATOR.generate(
+        index, text,
+        text_color=_TEXT_COLORS[index % len(_TEXT_COLORS)],
+        **_SHARED_PARAMS
+    )
+
+def worker_batch(tasks):
+    """
+    处理分给本工作进程的全部任务，每完成一张就累加共享进度计数器，
+    主进程轮询该计数器刷新进度条。返回完成的数量。
     """
-    return FakeTextDataGenerator.generate(*param_tuple)
+    for task in tasks:
+        worker(task)
+        if _PROGRESS is not None:
+            with _PROGRESS.get_lock():
+                _PROGRESS.value += 1
+    return len(tasks)
+
+def shard_tasks(tasks, num_shards):
+    """
+    把任务列表静态切成 num_shards 份（按步长交错取，各份长度最多差 1），
+    每个工作进程只领取一份，不再经任务队列逐批分发。
+    """
+    return [tasks[w::num_shards] for w in range(num_shards) if tasks[w::num_shards]]
+
+def wait_for_shards(results, progress, pbar, interval=0.25):
+    """
+    等待所有分片完成，期间每 interval 秒按共享计数器刷新进度条。
+    某个分片抛出的异常会在主进程中重新抛出。
+    """
+    pending = list(results)
+    while pending:
+        pending[0].wait(interval)
+        pbar.update(progress.value - pbar.n)
+        still_pending = []
+        for r in pending:
+            if r.ready():
+                r.get()
+            else:
+                still_pending.append(r)
+        pending = still_pending
+    pbar.update(progress.value - pbar.n)
 
 def print_banner():
     """打印欢迎横幅"""
@@ -238,12 +385,16 @@ def print_banner():
     """
     print(banner)
 
-def apply_quick_start_settings(args):
-    """应用快速开始设置"""
+def apply_quick_start_settings(args, cfg):
+    """
+    应用快速开始设置。
+    取值固定，直接赋给 args，不再经过 apply_command_line_overrides 的通用映射：
+    扁平化时 args 中已有的值优先，写回 cfg 再读出来是多余的。
+    """
     print("🚀 快速开始模式已启用")
     # 覆盖一些设置以适合快速测试
     args.count = 100
-    args.num_workers = min(4, args.num_workers) if hasattr(args, 'num_workers') else 4
+    args.num_workers = min(4, args.num_workers or cfg.OTHER_SETTINGS.NUM_WORKERS)
     
     # 使用示例语料库（如果存在）
     if Path("texts/sample_chinese.txt").exists():
@@ -254,6 +405,8 @@ def apply_quick_start_settings(args):
         args.language = "en"
         args.fonts = "en"
         print("📝 使用示例英文语料库")
+    
+    apply_flag_overrides(args, cfg)
 
 def apply_command_line_overrides(args, cfg):
     """应用命令行参数覆盖配置文件设置"""
@@ -280,7 +433,10 @@ def apply_command_line_overrides(args, cfg):
             if args.verbose:
                 print(f"🔧 覆盖配置: {section_name}.{config_key} = {getattr(args, arg_name)}")
     
-    # 特殊处理
+    apply_flag_overrides(args, cfg)
+
+def apply_flag_overrides(args, cfg):
+    """处理不能按名称直接映射的命令行参数"""
     if args.no_skew:
         cfg.DISTORTION_SETTINGS.SKEW_ANGLE = 0
         cfg.DISTORTION_SETTINGS.RANDOM_SKEW = False
@@ -305,12 +461,18 @@ def print_settings_summary(args):
     print(f"   进程数: {args.num_workers}")
     print(f"   图片格式: {args.extension}")
 
-def main():
+def main(argv=None):
+    """
+    程序入口。argv 与命令行参数格式相同，例如 ["--count", "100"]；
+    其他脚本可以直接调用 run.main(argv)，无需再启动子进程。
+    """
+    install_excepthook()
+    
     # 打印欢迎信息
     print_banner()
     
     # 1. 解析参数
-    args = parse_args()
+    args = parse_args(argv)
     
     # 诊断模式
     if args.diagnose:
@@ -330,18 +492,20 @@ def main():
     
     cfg = load_config(args.cfg)
     
-    # 3. 应用快速开始设置
+    # 3. 应用快速开始设置 / 4. 应用命令行参数覆盖
     if args.quick_start:
-        apply_quick_start_settings(args)
-    
-    # 4. 应用命令行参数覆盖
-    apply_command_line_overrides(args, cfg)
+        apply_quick_start_settings(args, cfg)
+    else:
+        apply_command_line_overrides(args, cfg)
     
     # 5. 将配置文件扁平化写入 args，保持后续代码兼容
-    for section in cfg.__dict__.values():
-        for key, value in section.__dict__.items():
-            if not hasattr(args, key.lower()) or getattr(args, key.lower()) is None:
-                setattr(args, key.lower(), value)
+    #    直接读写 vars(args)，省去逐个 hasattr/getattr/setattr
+    arg_dict = vars(args)
+    for section in vars(cfg).values():
+        for key, value in vars(section).items():
+            key = key.lower()
+            if arg_dict.get(key) is None:
+                arg_dict[key] = value
     
     # 6. 打印设置摘要
     if args.verbose:
@@ -355,6 +519,14 @@ def main():
         print(f"📁 保存到: {args.output_dir}")
         return
 
+    from tqdm import tqdm
+    from generators.text_generator import (
+        create_strings_from_dict,
+        create_strings_from_corpus_file,
+        create_strings_randomly_from_chars
+    )
+    load_generator()
+
     # 8. 加载语料库
     try:
         corpus_list = load_corpus(args.corpus)
@@ -371,6 +543,13 @@ def main():
             font_paths = load_fonts(args.fonts)
         else:
             font_paths = load_fonts('ch')  # 默认从 'ch' 目录加载
+        # 创建进程池前先确认每个字体都能打开，坏字体直接报错退出
+        from generators.image_generator import find_broken_fonts
+        broken = find_broken_fonts(font_paths, args.size)
+        if broken:
+            for font, err in broken:
+                print(f"❌ 无法打开字体 {font}: {err}")
+            sys.exit(1)
         num_fonts = len(font_paths)
         print(f"✅ 加载字体成功: {num_fonts} 个字体文件")
         if args.verbose:
@@ -419,50 +598,59 @@ def main():
     print(f"✅ 文本内容准备完成: {total_count} 个样本")
 
     # 11. 设置颜色
-    try:
-        font_color = tuple(map(int, args.color.strip("()").split(",")))
-        font_colors = [font_color]
-        num_colors = len(font_colors)
-        if args.verbose:
-            print(f"🎨 文字颜色: RGB{font_color}")
-    except Exception as e:
+    font_color = parse_color(str(args.color))
+    if font_color is None:
         print(f"❌ 颜色格式错误: {args.color}")
         print("💡 请使用格式: '(R,G,B)' 例如 '(0,0,0)' 表示黑色")
         sys.exit(1)
+    font_colors = [font_color]
+    if args.verbose:
+        print(f"🎨 文字颜色: RGB{font_color}")
+
+    # 解析边距（只解析一次，生成时直接使用整数元组）
+    margins = parse_margins(str(args.margins))
+    if margins is None:
+        print(f"❌ 边距格式错误: {args.margins}")
+        print("💡 请使用格式: '上,左,下,右' 例如 '5,4,5,4'，或单个数字表示四边相同")
+        sys.exit(1)
 
     # 12. 准备输出目录
     output_dir = Path(args.output_dir)
     output_dir.mkdir(parents=True, exist_ok=True)
+    # 分目录在派发任务前一次建好，工作进程不必并发创建
+    shard_size = SHARD_SIZE if total_count > SHARD_SIZE else 0
+    if shard_size:
+        for shard in range((total_count - 1) // shard_size + 1):
+            (output_dir / f"{shard:04d}").mkdir(exist_ok=True)
     print(f"📁 输出目录: {output_dir}")
+    if shard_size:
+        print(f"📂 每 {shard_size} 张图片一个子目录")
 
     # 13. 构造参数列表
     print("⚙️ 准备生成参数...")
-    cursive_flags = [0] * total_count
-    margins_str = args.margins
-
-    image_params = []
-    for i in range(total_count):
-        color_idx = i % num_colors
-        param_tuple = (
-            i,
-            args.strings[i],
-            font_paths,
-            str(output_dir),
-            cursive_flags[i],
-            args.size,
-            args.extension,
-            args.skew_angle,
-            args.width,
-            font_colors[color_idx],
-            args.orientation,
-            args.space_width,
-            margins_str,
-            args.fit,
-            args.stroke_width,
-            args.stroke_fill,
-            args.height
-        )
-        image_params.append(param_tuple)
+
+    # 不随图片变化的参数只传给每个工作进程一次
+    shared_params = {
+        'font_list': font_paths,
+        'out_dir': str(output_dir),
+        'size': args.size,
+        'extension': args.extension,
+        'skewing_angle': args.skew_angle,
+        'width': args.width,
+        'orientation': args.orientation,
+        'space_width': args.space_width,
+        'margins': margins,
+        'fit': args.fit,
+        'stroke_width': args.stroke_width,
+        'stroke_fill': args.stroke_fill,
+        'height': args.height,
+        'shard_size': shard_size,
+        'cursive': 0,
+    }
+
+    # 每张图片只传 (序号, 文本)；cursive 和颜色表随 shared_params 一次性传给工作进程
+    # 惰性迭代器：单进程模式按需产出任务，多进程模式再物化后分片
+    image_params = zip(range(total_count), args.strings)
 
     print(f"\n🚀 开始生成 {total_count} 张图像...")
     print(f"📊 进程数: {args.num_workers}")
@@ -470,18 +658,35 @@ def main():
     start_time = time.time()
 
     # 14. 多进程 / 单进程执行
+    # 进度条最多每 0.25 秒刷新一次，避免每张图片都写一次终端
+    progress_kwargs = {
+        'total': total_count,
+        'desc': "生成进度",
+        'mininterval': 0.25,
+        'miniters': max(1, total_count // 1000),
+        'smoothing': 0,
+    }
     try:
-        if args.num_workers <= 1:
+        if args.num_workers <= 1 or total_count < MIN_TASKS_FOR_POOL:
             # 单进程执行
             print("🔄 单进程模式")
-            for params in tqdm(image_params, total=total_count, desc="生成进度"):
-                FakeTextDataGenerator.generate(*params)
+            init_worker(shared_params, font_colors)
+            for params in tqdm(image_params, **progress_kwargs):
+                worker(params)
         else:
-            # 多进程执行
-            print(f"🔄 多进程模式 ({args.num_workers} 个进程)")
-            with Pool(processes=args.num_workers) as pool:
-                for _ in tqdm(pool.imap_unordered(worker, image_params), total=total_count, desc="生成进度"):
-                    pass
+            # 多进程/多线程执行：任务静态分片，每个工作进程一次领取一整份，
+            # 进度通过共享计数器回报，不经结果队列
+            executor = resolve_executor(args.executor)
+            if executor == 'thread':
+                print(f"🔄 多线程模式 ({args.num_workers} 个线程)")
+            else:
+                print(f"🔄 多进程模式 ({args.num_workers} 个进程)")
+            shards = shard_tasks(list(image_params), args.num_workers)
+            progress = get_pool_context().Value('i', 0)
+            with create_pool(executor, args.num_workers, shared_params, font_colors, progress) as pool, \
+                    tqdm(**progress_kwargs) as pbar:
+                results = [pool.apply_async(worker_batch, (shard,)) for shard in shards]
+                wait_for_shards(results, progress, pbar)
     except KeyboardInterrupt:
         print("\n❌ 生成被用户中断")
         sys.exit(0)
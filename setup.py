@@ -48,8 +48,22 @@ def install_dependencies():
         print("❌ 依赖包安装失败")
         print("💡 请手动运行：pip install -r requirements.txt")
         return False
+    check_libyaml()
     return True
 
+def check_libyaml():
+    """检查 PyYAML 是否带有 libyaml C 扩展（配置加载使用 CSafeLoader）"""
+    # 在新进程中检查，确保读到的是刚安装的 PyYAML
+    result = subprocess.run(
+        [sys.executable, "-c", "import yaml; print(yaml.__with_libyaml__)"],
+        capture_output=True, text=True
+    )
+    if result.stdout.strip() == "True":
+        print("✅ PyYAML 已启用 libyaml 加速")
+    else:
+        print("⚠️ PyYAML 未启用 libyaml，配置解析将使用较慢的纯 Python 实现")
+        print("💡 可尝试：pip install --force-reinstall --no-cache-dir pyyaml")
+
 def create_directories():
     """创建必要的目录结构"""
     print("\n📁 创建目录结构...")
@@ -0,0 +1,40 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from core import config
+from core.config import load_config
+
+
+class LoadConfigCacheTest(unittest.TestCase):
+    """修改 load_config 返回的配置不能影响之后的加载结果"""
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.addCleanup(config._CACHE.clear)
+        self.path = Path(self._tmp.name) / 'config.yaml'
+        self.path.write_text(
+            "TEXT_SETTINGS:\n"
+            "  SIZES: [24, 32]\n"
+            "  COLORS:\n"
+            "    - [0, 0, 0]\n",
+            encoding='utf-8',
+        )
+
+    def test_mutating_lists_does_not_leak_into_cache(self):
+        # 第一次加载（写入缓存）和缓存命中时返回的列表都可以随意修改
+        for _ in range(2):
+            cfg = load_config(str(self.path))
+            cfg.TEXT_SETTINGS.SIZES.append(48)
+            cfg.TEXT_SETTINGS.COLORS[0].append(255)
+            cfg.TEXT_SETTINGS.NEW_KEY = 1
+
+        cfg = load_config(str(self.path))
+        self.assertEqual(cfg.TEXT_SETTINGS.SIZES, [24, 32])
+        self.assertEqual(cfg.TEXT_SETTINGS.COLORS, [[0, 0, 0]])
+        self.assertFalse(hasattr(cfg.TEXT_SETTINGS, 'NEW_KEY'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import run
+from core import diagnostics
+
+
+class CorpusLineCountTest(unittest.TestCase):
+    """check_corpus 的行数须与 run.load_corpus 实际加载的行数一致"""
+
+    CASES = {
+        'cr': b'a\rb\rc\r',
+        'crlf': b'a\r\nb\r\n\r\n c \r\n',
+        'mixed': b'a\rb\r\nc\n\r\n \r\xe2\x80\x83\r\nd',
+        'bom_cr': b'\xef\xbb\xbfa\r\r b\r',
+        'unicode_blank': 'a\n \n　\xa0\nb'.encode('utf-8'),
+    }
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+
+    def assert_counts_match(self, name, data):
+        path = Path(self._tmp.name) / f'{name}.txt'
+        path.write_bytes(data)
+        st = path.stat()
+        count = diagnostics._count_corpus_lines(str(path.resolve()), st.st_mtime_ns, st.st_size)
+        self.assertEqual(count, len(run.load_corpus(str(path))), name)
+
+    def test_matches_load_corpus(self):
+        for name, data in self.CASES.items():
+            self.assert_counts_match(name, data)
+
+    def test_line_endings_split_across_chunks(self):
+        # 分块很小时，\r\n 会被切到两块中，超长空白行会被压缩
+        original = diagnostics._CHUNK_SIZE
+        diagnostics._CHUNK_SIZE = 3
+        self.addCleanup(setattr, diagnostics, '_CHUNK_SIZE', original)
+        diagnostics._count_corpus_lines.cache_clear()
+        self.addCleanup(diagnostics._count_corpus_lines.cache_clear)
+        for name, data in self.CASES.items():
+            self.assert_counts_match(f'small_{name}', data)
+        self.assert_counts_match('long_blank', ('\xa0' * 40 + '\r\nb\r').encode('utf-8'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+
+try:
+    import numpy as np
+    from PIL import Image, ImageDraw, ImageEnhance
+except ImportError:  # 未安装 Pillow / NumPy 时跳过
+    np = None
+
+if np is not None:
+    import img_aug
+
+
+def _text_image(mode='RGB'):
+    """白底黑字的测试图：亮度系数 > 1 时白色会饱和"""
+    img = Image.new(mode, (64, 24), 'white')
+    ImageDraw.Draw(img).rectangle((8, 6, 40, 18), fill='black')
+    return img
+
+
+def _enhance(img, brightness_factor, contrast_factor):
+    if brightness_factor != 1.0:
+        img = ImageEnhance.Brightness(img).enhance(brightness_factor)
+    if contrast_factor != 1.0:
+        img = ImageEnhance.Contrast(img).enhance(contrast_factor)
+    return img
+
+
+@unittest.skipIf(np is None, 'Pillow / NumPy 未安装')
+class ToneLutTest(unittest.TestCase):
+    """_tone_lut 的结果须与先后调用 ImageEnhance.Brightness / Contrast 相同"""
+
+    FACTORS = [(1.2, 1.0), (0.8, 1.0), (1.0, 1.2), (1.0, 0.8), (1.2, 0.8), (0.7, 1.3), (1.3, 1.3)]
+
+    def assert_matches_enhance(self, img, brightness_factor, contrast_factor):
+        expected = _enhance(img, brightness_factor, contrast_factor)
+        actual = img_aug._tone_lut(img, brightness_factor, contrast_factor)
+        self.assertEqual(actual.mode, expected.mode)
+        self.assertEqual(actual.tobytes(), expected.tobytes(),
+                         (img.mode, brightness_factor, contrast_factor))
+
+    def test_matches_enhance(self):
+        for mode in ('L', 'RGB'):
+            img = _text_image(mode)
+            for factors in self.FACTORS:
+                self.assert_matches_enhance(img, *factors)
+
+    def test_saturating_brightness_then_contrast(self):
+        # 白色在亮度 1.2 下饱和为 255，对比度中心须取截断后的均值
+        img = _text_image()
+        expected = _enhance(img, 1.2, 0.8)
+        out = img_aug._tone_lut(img, 1.2, 0.8)
+        self.assertEqual(out.getpixel((0, 0)), expected.getpixel((0, 0)))
+        self.assertEqual(out.getpixel((20, 12)), expected.getpixel((20, 12)))
+
+    def test_alpha_is_unchanged(self):
+        img = _text_image('RGBA')
+        img.putalpha(Image.linear_gradient('L').resize(img.size))
+        out = img_aug._tone_lut(img, 1.2, 0.8)
+        self.assertEqual(out.getchannel('A').tobytes(), img.getchannel('A').tobytes())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -7,47 +7,168 @@ GNTM Web界面
 
 import os
 import sys
+import io
+import gzip
 import json
+import signal
+import contextlib
 import subprocess
+import tempfile
 import threading
 import time
+import traceback
+import multiprocessing
+import concurrent.futures
 from pathlib import Path
-from http.server import HTTPServer, BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
 from urllib.parse import parse_qs, urlparse
 import webbrowser
 
-class GTNMWebHandler(BaseHTTPRequestHandler):
-    """GNTM Web请求处理器"""
-    
-    def do_GET(self):
-        """处理GET请求"""
-        path = urlparse(self.path).path
-        
-        if path == '/' or path == '/index.html':
-            self.serve_index()
-        elif path == '/api/status':
-            self.serve_status()
-        elif path == '/api/fonts':
-            self.serve_fonts()
-        elif path == '/api/corpus':
-            self.serve_corpus()
-        elif path.startswith('/output/'):
-            self.serve_output(path)
-        else:
-            self.send_error(404)
-    
-    def do_POST(self):
-        """处理POST请求"""
-        path = urlparse(self.path).path
-        
-        if path == '/api/generate':
-            self.handle_generate()
+from core.cache import sidecar_path
+from core.diagnostics import GTNMDiagnostics
+
+# 单次生成的最长等待时间（秒）
+GENERATE_TIMEOUT = 300
+
+# Web 界面生成的图片统一保存到这里
+WEB_OUTPUT_DIR = Path('output/web_generated')
+
+# 子进程方式运行时的命令前缀
+_CMD_BASE = (sys.executable, str(Path(__file__).resolve().with_name('run.py')))
+# 每次生成都相同的参数
+_GENERATE_FIXED_ARGV = ('--output_dir', str(WEB_OUTPUT_DIR), '--num_workers', '4')
+# 来自请求的参数: (命令行参数, 请求 JSON 中的键, 默认值)
+_GENERATE_OPTIONS = (
+    ('--language', 'language', 'ch'),
+    ('--fonts', 'fonts', 'ch'),
+    ('--count', 'count', 50),
+    ('--size', 'size', 32),
+    ('--extension', 'extension', 'jpg'),
+    ('--skew_angle', 'skew_angle', 10),
+)
+
+def _run_generation_subprocess(argv, timeout):
+    """
+    在子进程中运行 run.py 并等待结束，返回 subprocess.CompletedProcess。
+    run.py 会再启动工作进程，因此放在独立的进程组里运行；超时时结束整个进程组，
+    不会留下继续写图片的孤儿进程，然后抛出 subprocess.TimeoutExpired。
+    """
+    cmd = [*_CMD_BASE, *argv]
+    posix = os.name == 'posix'
+    proc = subprocess.Popen(
+        cmd,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        start_new_session=posix,
+    )
+    try:
+        stdout, stderr = proc.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        _kill_process_group(proc.pid)
+        proc.communicate()
+        raise
+    return subprocess.CompletedProcess(cmd, proc.returncode, stdout, stderr)
+
+def _kill_process_group(pid):
+    """结束以 pid 为组长的进程组（非 POSIX 系统上只结束该进程）"""
+    try:
+        if os.name == 'posix':
+            os.killpg(pid, signal.SIGKILL)
         else:
-            self.send_error(404)
+            os.kill(pid, signal.SIGTERM)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+# 常驻的生成进程：第一次生成时启动，之后的请求复用其中已导入的 run.py、PIL 和字体。
+# 同一时间只运行一个生成任务，_generation_lock 在整个生成期间持有
+_generation_lock = threading.Lock()
+_generator_pool = None
+_generator_pid = None
+
+def _init_generator_process():
+    """生成进程初始化：自成进程组，并预先导入 run.py 和图像生成器"""
+    if os.name == 'posix':
+        os.setsid()
+    import run
+    try:
+        run.load_generator()
+    except Exception:  # 缺少依赖等错误留给 run.main 报告，并随响应返回
+        pass
+
+def _generate_in_process(argv):
+    """在生成进程中调用 run.main(argv)，返回 (退出码, stdout, stderr)"""
+    import run
+    if multiprocessing.current_process().daemon:
+        # Python 3.8 及更早版本中 ProcessPoolExecutor 的工作进程是守护进程，不能再创建进程池
+        argv = [*argv, '--executor', 'thread']
+    stdout, stderr = io.StringIO(), io.StringIO()
+    code = 0
+    with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+        try:
+            run.main(argv)
+        except SystemExit as e:
+            if e.code is None or isinstance(e.code, int):
+                code = e.code or 0
+            else:
+                print(e.code, file=sys.stderr)
+                code = 1
+        except Exception:
+            traceback.print_exc()
+            code = 1
+    return code, stdout.getvalue(), stderr.getvalue()
+
+def _get_generator_pool():
+    """返回常驻生成进程池及其进程号，必要时创建；调用方需持有 _generation_lock"""
+    global _generator_pool, _generator_pid
+    if _generator_pool is None:
+        # 服务器是多线程进程，用 spawn 启动生成进程，避免在持有锁的线程之间 fork
+        _generator_pool = concurrent.futures.ProcessPoolExecutor(
+            max_workers=1,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_generator_process,
+        )
+        _generator_pid = _generator_pool.submit(os.getpid).result()
+    return _generator_pool, _generator_pid
+
+def _discard_generator_pool(kill=False):
+    """丢弃生成进程池，kill=True 时先结束生成进程及其工作进程"""
+    global _generator_pool, _generator_pid
+    if _generator_pool is None:
+        return
+    if kill:
+        _kill_process_group(_generator_pid)
+    _generator_pool.shutdown(wait=False)
+    _generator_pool = None
+    _generator_pid = None
+
+def run_generation(argv, timeout=GENERATE_TIMEOUT):
+    """
+    以 run.py 的命令行参数 argv 执行一次生成，返回 subprocess.CompletedProcess。
+    默认在常驻生成进程中直接调用 run.main，省去每次启动解释器和导入 PIL 的开销；
+    设置环境变量 GNTM_NO_INPROC 时改为启动 run.py 子进程。
+    超时时结束生成进程，抛出 subprocess.TimeoutExpired。
+    """
+    if os.environ.get('GNTM_NO_INPROC'):
+        return _run_generation_subprocess(argv, timeout)
     
-    def serve_index(self):
-        """服务主页"""
-        html = """
+    with _generation_lock:
+        try:
+            pool, _ = _get_generator_pool()
+            future = pool.submit(_generate_in_process, list(argv))
+            code, stdout, stderr = future.result(timeout=timeout)
+        except concurrent.futures.TimeoutError:
+            _discard_generator_pool(kill=True)
+            raise subprocess.TimeoutExpired(argv, timeout)
+        except concurrent.futures.BrokenExecutor:
+            # 生成进程启动失败或中途崩溃，下次请求重新创建
+            _discard_generator_pool()
+            return subprocess.CompletedProcess(argv, 1, '', '生成进程异常退出')
+    return subprocess.CompletedProcess(argv, code, stdout, stderr)
+
+# 主页内容固定不变，模块加载时编码一次，之后每个请求直接写出
+_INDEX_HTML = """
 <!DOCTYPE html>
 <html lang="zh-CN">
 <head>
@@ -240,6 +361,48 @@ class GTNMWebHandler(BaseHTTPRequestHandler):
         const gallery = document.getElementById('gallery');
         const generateBtn = document.getElementById('generateBtn');
         
+        // 读取 /api/generate 的事件流：progress 事件更新进度并追加预览图，返回 result 事件的数据
+        async function readGenerateStream(response) {
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            let result = null;
+            
+            const handleEvent = (block) => {
+                let event = 'message';
+                let payload = '';
+                block.split('\\n').forEach(line => {
+                    if (line.startsWith('event: ')) event = line.slice(7);
+                    else if (line.startsWith('data: ')) payload += line.slice(6);
+                });
+                if (!payload) return;
+                const data = JSON.parse(payload);
+                if (event === 'result') {
+                    result = data;
+                } else if (event === 'progress') {
+                    status.textContent = `正在生成图片... ${data.done} / ${data.total}`;
+                    data.images.forEach(img => {
+                        const imgEl = document.createElement('img');
+                        imgEl.src = img;
+                        imgEl.alt = '生成的图片';
+                        gallery.appendChild(imgEl);
+                    });
+                }
+            };
+            
+            while (true) {
+                const { done, value } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
+                let sep;
+                while ((sep = buffer.indexOf('\\n\\n')) !== -1) {
+                    handleEvent(buffer.slice(0, sep));
+                    buffer = buffer.slice(sep + 2);
+                }
+            }
+            return result || { success: false, error: '连接中断' };
+        }
+        
         form.addEventListener('submit', async (e) => {
             e.preventDefault();
             
@@ -256,11 +419,18 @@ class GTNMWebHandler(BaseHTTPRequestHandler):
             try {
                 const response = await fetch('/api/generate', {
                     method: 'POST',
-                    headers: { 'Content-Type': 'application/json' },
+                    headers: {
+                        'Content-Type': 'application/json',
+                        'Accept': 'text/event-stream, application/json'
+                    },
                     body: JSON.stringify(data)
                 });
                 
-                const result = await response.json();
+                // 服务器按事件流推送进度时边生成边显示；否则等待完整的 JSON 结果
+                const contentType = response.headers.get('Content-Type') || '';
+                const result = (contentType.startsWith('text/event-stream') && response.body)
+                    ? await readGenerateStream(response)
+                    : await response.json();
                 
                 if (result.success) {
                     status.className = 'status success';
@@ -296,62 +466,236 @@ class GTNMWebHandler(BaseHTTPRequestHandler):
     </script>
 </body>
 </html>
-        """
+"""
+_INDEX_HTML_BYTES = _INDEX_HTML.encode('utf-8')
+_INDEX_CONTENT_LENGTH = str(len(_INDEX_HTML_BYTES))
+_INDEX_HTML_GZIP = gzip.compress(_INDEX_HTML_BYTES, compresslevel=9)
+_INDEX_GZIP_CONTENT_LENGTH = str(len(_INDEX_HTML_GZIP))
+
+# 小于该字节数的响应不压缩，省下的流量抵不过压缩开销
+GZIP_MIN_SIZE = 512
+
+# /output/ 请求只能访问该目录下的文件
+_OUTPUT_ROOT = Path('output').resolve()
+
+# 生成请求体的大小上限（字节）
+MAX_REQUEST_BODY = 1 << 20
+
+# 状态 / 字体列表接口的结果缓存: key -> (stamp, JSON bytes)
+API_CACHE_TTL = 5
+_api_cache = {}
+FONT_DIRS = ('ch', 'en')
+
+def _font_dirs_stamp():
+    """各字体目录的 st_mtime_ns，增删字体文件后随之变化；目录不存在时为 None"""
+    stamp = []
+    for font_dir in FONT_DIRS:
+        try:
+            stamp.append(os.stat(f'fonts/{font_dir}').st_mtime_ns)
+        except OSError:
+            stamp.append(None)
+    return tuple(stamp)
+
+try:
+    import orjson
+except ImportError:  # 未安装 orjson 时使用标准库 json
+    orjson = None
+
+if orjson is not None:
+    def _encode_json(data):
+        return orjson.dumps(data)
+    
+    # orjson.JSONDecodeError 是 json.JSONDecodeError 的子类
+    _decode_json = orjson.loads
+else:
+    def _encode_json(data):
+        return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    
+    # json.loads 可直接解析 UTF-8 bytes，无需先 decode
+    _decode_json = json.loads
+
+# 环境检查和各字体目录检查互不依赖，在线程池中同时进行
+_diag_executor = concurrent.futures.ThreadPoolExecutor(
+    max_workers=1 + len(FONT_DIRS), thread_name_prefix='gntm-diag'
+)
+
+def _build_status():
+    """
+    汇总环境检查和字体检查结果。
+    只在缓存时间片切换（或缓存被清空）时调用，先丢弃诊断模块的缓存，
+    保证每个时间片都重新检查一次。
+    """
+    GTNMDiagnostics.invalidate()
+    env_future = _diag_executor.submit(GTNMDiagnostics.check_environment)
+    font_futures = {
+        font_dir: _diag_executor.submit(GTNMDiagnostics.check_fonts, font_dir)
+        for font_dir in FONT_DIRS
+    }
+    
+    checks = env_future.result()
+    status = {
+        'environment': [
+            {'name': name, 'ok': ok, 'message': msg}
+            for name, ok, msg in checks
+        ],
+        'fonts': {},
+        'ready': all(ok for _, ok, _ in checks)
+    }
+    
+    # 检查字体
+    for font_dir, future in font_futures.items():
+        ok, fonts, msg = future.result()
+        status['fonts'][font_dir] = {
+            'ok': ok,
+            'count': len(fonts),
+            'message': msg
+        }
+    return status
+
+def _build_fonts():
+    """各字体目录下的字体列表"""
+    fonts = {}
+    for font_dir in FONT_DIRS:
+        ok, font_list, msg = GTNMDiagnostics.check_fonts(font_dir)
+        fonts[font_dir] = font_list if ok else []
+    return fonts
+
+def _snapshot_images(output_dir, extension):
+    """
+    返回 output_dir 下指定格式的图片: 文件名 -> st_mtime_ns；目录不存在时为空。
+    生成器先写隐藏临时文件 (.tmp-*) 再原子替换，跳过以 . 开头的文件，
+    列出的图片都已写完，可以直接预览。
+    """
+    suffix = f".{extension}"
+    try:
+        with os.scandir(output_dir) as entries:
+            return {
+                e.name: e.stat().st_mtime_ns
+                for e in entries
+                if e.name.endswith(suffix) and not e.name.startswith('.') and e.is_file()
+            }
+    except FileNotFoundError:
+        return {}
+
+TEXTS_DIR = Path('texts')
+
+def _build_corpus():
+    """texts/ 目录下的 .txt 语料文件列表"""
+    try:
+        with os.scandir(TEXTS_DIR) as entries:
+            names = sorted(e.name for e in entries if e.name.endswith('.txt') and e.is_file())
+    except OSError:
+        return []
+    return [str(TEXTS_DIR / name) for name in names]
+
+# 生成结果最多返回的预览图数量；流式生成时进度推送的间隔（秒）
+PREVIEW_LIMIT = 20
+STREAM_INTERVAL = 0.5
+
+def _new_images(before, after, output_dir):
+    """按文件名排序返回 after 中新出现或被覆盖的图片的 URL"""
+    return [
+        f"/{output_dir.as_posix()}/{name}"
+        for name in sorted(after)
+        if before.get(name) != after[name]
+    ]
+
+def _generation_payload(result, output_dir, extension, before):
+    """把一次生成的 CompletedProcess 整理成 /api/generate 的响应数据"""
+    if result.returncode != 0:
+        return {
+            'success': False,
+            'error': result.stderr or result.stdout or '生成失败'
+        }
+    
+    # 生成可能改变了环境检查结果，丢弃状态缓存和诊断模块的缓存
+    GTNMDiagnostics.invalidate()
+    _api_cache.clear()
+    # 获取本次生成的图片列表
+    images = _new_images(before, _snapshot_images(output_dir, extension), output_dir)
+    return {
+        'success': True,
+        'count': len(images),
+        'images': images[:PREVIEW_LIMIT],  # 只返回前20张用于预览
+        'output_dir': str(output_dir)
+    }
+
+class GTNMWebHandler(BaseHTTPRequestHandler):
+    """GNTM Web请求处理器"""
+    
+    # HTTP/1.1 保持连接，画廊的多张图片复用同一个 TCP 连接；
+    # 因此每个带正文的响应都必须给出 Content-Length
+    protocol_version = 'HTTP/1.1'
+    # 空闲连接 30 秒后关闭，避免长期占用处理线程
+    timeout = 30
+    
+    def do_GET(self):
+        """处理GET请求"""
+        path = urlparse(self.path).path
         
+        handler = self._GET_ROUTES.get(path)
+        if handler is not None:
+            handler(self)
+        elif path.startswith('/output/'):
+            self.serve_output(path)
+        else:
+            self.send_error(404)
+    
+    def do_POST(self):
+        """处理POST请求"""
+        path = urlparse(self.path).path
+        
+        handler = self._POST_ROUTES.get(path)
+        if handler is not None:
+            handler(self)
+        else:
+            self.send_error(404)
+    
+    def serve_index(self):
+        """服务主页"""
+        use_gzip = self.accepts_gzip()
         self.send_response(200)
         self.send_header('Content-type', 'text/html; charset=utf-8')
+        if use_gzip:
+            self.send_header('Content-Encoding', 'gzip')
+            self.send_header('Content-Length', _INDEX_GZIP_CONTENT_LENGTH)
+        else:
+            self.send_header('Content-Length', _INDEX_CONTENT_LENGTH)
+        self.send_header('Vary', 'Accept-Encoding')
+        self.send_header('Cache-Control', 'public, max-age=3600')
         self.end_headers()
-        self.wfile.write(html.encode('utf-8'))
+        self.wfile.write(_INDEX_HTML_GZIP if use_gzip else _INDEX_HTML_BYTES)
     
     def serve_status(self):
         """服务状态API"""
-        from core.diagnostics import GTNMDiagnostics
-        
-        checks = GTNMDiagnostics.check_environment()
-        status = {
-            'environment': [
-                {'name': name, 'ok': ok, 'message': msg}
-                for name, ok, msg in checks
-            ],
-            'fonts': {},
-            'ready': all(ok for _, ok, _ in checks)
-        }
-        
-        # 检查字体
-        for font_dir in ['ch', 'en']:
-            ok, fonts, msg = GTNMDiagnostics.check_fonts(font_dir)
-            status['fonts'][font_dir] = {
-                'ok': ok,
-                'count': len(fonts),
-                'message': msg
-            }
-        
-        self.send_json(status)
+        # 按 API_CACHE_TTL 秒划分时间片，同一时间片内的查询共用一次检查结果
+        self.send_cached_json('status', _build_status, int(time.monotonic() // API_CACHE_TTL))
     
     def serve_fonts(self):
         """服务字体列表API"""
-        fonts = {}
-        for font_dir in ['ch', 'en']:
-            ok, font_list, msg = GTNMDiagnostics.check_fonts(font_dir)
-            fonts[font_dir] = font_list if ok else []
-        
-        self.send_json(fonts)
+        # 字体目录内容不变（mtime 不变）时一直复用上次的列表
+        self.send_cached_json('fonts', _build_fonts, _font_dirs_stamp())
     
     def serve_corpus(self):
         """服务语料库列表API"""
-        corpus_files = []
-        texts_dir = Path('texts')
-        if texts_dir.exists():
-            for file in texts_dir.glob('*.txt'):
-                corpus_files.append(str(file))
-        
-        self.send_json(corpus_files)
+        # texts/ 下增删文件会改变目录 mtime，未变化时复用上次的列表
+        try:
+            stamp = os.stat(TEXTS_DIR).st_mtime_ns
+        except OSError:
+            stamp = None
+        self.send_cached_json('corpus', _build_corpus, stamp)
     
     def serve_output(self, path):
         """服务输出文件"""
         file_path = Path(path[1:])  # 移除开头的 /
         
-        if not file_path.exists():
+        # 只允许访问 output/ 目录下的文件
+        try:
+            file_path.resolve().relative_to(_OUTPUT_ROOT)
+        except ValueError:
+            self.send_error(404)
+            return
+        if not file_path.is_file():
             self.send_error(404)
             return
         
@@ -363,20 +707,42 @@ class GTNMWebHandler(BaseHTTPRequestHandler):
         else:
             content_type = 'application/octet-stream'
         
-        self.send_response(200)
-        self.send_header('Content-type', content_type)
-        self.end_headers()
-        
         with open(file_path, 'rb') as f:
-            self.wfile.write(f.read())
+            st = os.fstat(f.fileno())
+            # 重新生成后同名图片的 mtime/大小会变化，未变化时浏览器直接用缓存
+            etag = f'"{st.st_mtime_ns:x}-{st.st_size:x}"'
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.end_headers()
+                return
+            
+            self.send_response(200)
+            self.send_header('Content-type', content_type)
+            self.send_header('Content-Length', str(st.st_size))
+            self.send_header('ETag', etag)
+            self.end_headers()
+            # 由内核直接把文件发到 socket（不支持 sendfile 时自动退回分块读写），
+            # 不再把整张图片读进内存
+            self.connection.sendfile(f)
     
     def handle_generate(self):
         """处理生成请求"""
-        content_length = int(self.headers['Content-Length'])
+        # 没有合法的 Content-Length 就无法确定请求体的边界，直接拒绝并关闭连接
+        try:
+            content_length = int(self.headers.get('Content-Length', ''))
+        except ValueError:
+            self.send_error(411)
+            return
+        if not 0 <= content_length <= MAX_REQUEST_BODY:
+            self.send_error(413)
+            return
         post_data = self.rfile.read(content_length)
         
         try:
-            data = json.loads(post_data.decode('utf-8'))
+            data = _decode_json(post_data)
+            if not isinstance(data, dict):
+                raise json.JSONDecodeError('expected an object', '', 0)
             
             # 创建临时语料库文件
             corpus_content = data.get('corpus', '').strip()
@@ -384,55 +750,40 @@ class GTNMWebHandler(BaseHTTPRequestHandler):
                 self.send_json({'success': False, 'error': '请输入文本内容'})
                 return
             
-            temp_corpus = Path('temp_web_corpus.txt')
-            with open(temp_corpus, 'w', encoding='utf-8') as f:
+            # 每个请求写自己的临时语料文件，并发请求互不覆盖
+            with tempfile.NamedTemporaryFile(
+                'w', encoding='utf-8', suffix='.txt', prefix='gntm_web_', delete=False
+            ) as f:
                 f.write(corpus_content)
+                temp_corpus = Path(f.name)
             
-            # 构建命令
-            cmd = [
-                sys.executable, 'run.py',
-                '--language', data.get('language', 'ch'),
-                '--fonts', data.get('fonts', 'ch'),
-                '--corpus', str(temp_corpus),
-                '--count', str(data.get('count', 50)),
-                '--size', str(data.get('size', 32)),
-                '--extension', data.get('extension', 'jpg'),
-                '--skew_angle', str(data.get('skew_angle', 10)),
-                '--output_dir', 'output/web_generated',
-                '--num_workers', '4'
-            ]
-            
-            # 执行生成
-            result = subprocess.run(
-                cmd, 
-                capture_output=True, 
-                text=True, 
-                timeout=300  # 5分钟超时
-            )
-            
-            # 清理临时文件
-            if temp_corpus.exists():
-                temp_corpus.unlink()
-            
-            if result.returncode == 0:
-                # 获取生成的图片列表
-                output_dir = Path('output/web_generated')
-                images = []
-                if output_dir.exists():
-                    for img in output_dir.glob(f"*.{data.get('extension', 'jpg')}"):
-                        images.append(f"/{img}")
+            try:
+                output_dir = WEB_OUTPUT_DIR
+                extension = str(data.get('extension', 'jpg'))
+                # 记录生成前已有的图片，生成后只返回本次新写入（或被覆盖）的图片
+                before = _snapshot_images(output_dir, extension)
                 
-                self.send_json({
-                    'success': True,
-                    'count': len(images),
-                    'images': images[:20],  # 只返回前20张用于预览
-                    'output_dir': str(output_dir)
-                })
-            else:
-                self.send_json({
-                    'success': False,
-                    'error': result.stderr or result.stdout or '生成失败'
-                })
+                # 构建命令
+                argv = [*_GENERATE_FIXED_ARGV, '--corpus', str(temp_corpus)]
+                for flag, key, default in _GENERATE_OPTIONS:
+                    argv += (flag, str(data.get(key, default)))
+                
+                if self.wants_event_stream():
+                    # 流式响应在 stream_generation 内部处理超时和错误
+                    self.stream_generation(argv, output_dir, extension, before)
+                    return
+                
+                # 执行生成（5分钟超时）
+                result = run_generation(argv)
+            finally:
+                # 清理临时文件及 run.py 写下的语料缓存
+                for path in (temp_corpus, sidecar_path(temp_corpus)):
+                    try:
+                        path.unlink()
+                    except FileNotFoundError:
+                        pass
+            
+            self.send_json(_generation_payload(result, output_dir, extension, before))
                 
         except json.JSONDecodeError:
             self.send_json({'success': False, 'error': '无效的JSON数据'})
@@ -441,21 +792,125 @@ class GTNMWebHandler(BaseHTTPRequestHandler):
         except Exception as e:
             self.send_json({'success': False, 'error': str(e)})
     
+    def wants_event_stream(self):
+        """客户端是否通过 Accept 请求 server-sent events 格式的进度推送"""
+        return 'text/event-stream' in self.headers.get('Accept', '')
+    
+    def stream_generation(self, argv, output_dir, extension, before):
+        """
+        以 server-sent events 推送生成进度：生成期间每 STREAM_INTERVAL 秒发送一次
+        progress 事件（已写入的图片数和新出现的预览图），结束时发送 result 事件，
+        内容与普通 JSON 响应相同。
+        """
+        total = int(argv[argv.index('--count') + 1])
+        
+        self.send_response(200)
+        self.send_header('Content-type', 'text/event-stream; charset=utf-8')
+        self.send_header('Cache-Control', 'no-cache')
+        # 事件流没有 Content-Length，发送完毕后关闭连接
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        
+        outcome = {}
+        
+        def target():
+            try:
+                outcome['result'] = run_generation(argv)
+            except subprocess.TimeoutExpired:
+                outcome['error'] = '生成超时，请减少图片数量'
+            except Exception as e:
+                outcome['error'] = str(e)
+        
+        worker = threading.Thread(target=target, daemon=True)
+        worker.start()
+        sent = []
+        connected = True
+        while worker.is_alive():
+            worker.join(STREAM_INTERVAL)
+            if not connected:
+                # 客户端已断开，仍等生成结束后再清理临时文件
+                continue
+            images = _new_images(before, _snapshot_images(output_dir, extension), output_dir)
+            fresh = [img for img in images[:PREVIEW_LIMIT] if img not in sent]
+            sent.extend(fresh)
+            connected = self.send_event('progress', {
+                'done': len(images),
+                'total': total,
+                'images': fresh,
+            })
+        
+        if 'result' in outcome:
+            payload = _generation_payload(outcome['result'], output_dir, extension, before)
+        else:
+            payload = {'success': False, 'error': outcome['error']}
+        if connected:
+            self.send_event('result', payload)
+    
+    def send_event(self, event, data):
+        """发送一条 server-sent event，客户端已断开时返回 False"""
+        message = f"event: {event}\ndata: ".encode('utf-8') + _encode_json(data) + b"\n\n"
+        try:
+            self.wfile.write(message)
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            return False
+        return True
+    
     def send_json(self, data):
         """发送JSON响应"""
+        self.send_json_bytes(_encode_json(data))
+    
+    def send_json_bytes(self, body):
+        """发送已编码的JSON响应，客户端支持时用 gzip 压缩"""
+        use_gzip = len(body) >= GZIP_MIN_SIZE and self.accepts_gzip()
+        if use_gzip:
+            body = gzip.compress(body, compresslevel=1)
         self.send_response(200)
         self.send_header('Content-type', 'application/json; charset=utf-8')
+        if use_gzip:
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Vary', 'Accept-Encoding')
         self.end_headers()
-        self.wfile.write(json.dumps(data, ensure_ascii=False).encode('utf-8'))
+        self.wfile.write(body)
+    
+    def accepts_gzip(self):
+        """请求头 Accept-Encoding 中是否包含 gzip"""
+        return 'gzip' in self.headers.get('Accept-Encoding', '')
+    
+    def send_cached_json(self, key, build, stamp):
+        """
+        发送 build() 结果的JSON；stamp 与上次缓存时相同则直接复用编码好的结果。
+        """
+        entry = _api_cache.get(key)
+        if entry is not None and entry[0] == stamp:
+            body = entry[1]
+        else:
+            body = _encode_json(build())
+            _api_cache[key] = (stamp, body)
+        self.send_json_bytes(body)
     
     def log_message(self, format, *args):
         """禁用访问日志"""
         pass
+    
+    # 路由表：路径 -> 处理方法；/output/ 前缀在 do_GET 中单独处理
+    _GET_ROUTES = {
+        '/': serve_index,
+        '/index.html': serve_index,
+        '/api/status': serve_status,
+        '/api/fonts': serve_fonts,
+        '/api/corpus': serve_corpus,
+    }
+    _POST_ROUTES = {
+        '/api/generate': handle_generate,
+    }
 
 def run_server(port=8080):
     """运行Web服务器"""
     try:
-        server = HTTPServer(('localhost', port), GTNMWebHandler)
+        # 每个请求一个线程：生成任务运行期间，状态查询和图片请求不会被阻塞
+        server = ThreadingHTTPServer(('localhost', port), GTNMWebHandler)
         print(f"🌐 GNTM Web界面已启动")
         print(f"📍 访问地址: http://localhost:{port}")
         print(f"🔧 按 Ctrl+C 停止服务器")